@@ -1,9 +1,38 @@
+import time
+
+# startup checkpoints (wall clock, and CPU time used by the interpreter so far), reported by --startup-time
+_STARTUP_MARKS = {'start': (time.perf_counter(), time.process_time())}
+
+import os
+import csv
 import sys
+import json
+import math
 import random
-import pandas as pd
+import heapq
+import struct
+import hashlib
+import functools
+import contextlib
+import itertools
+import statistics
+from dataclasses import dataclass, field, fields, replace, asdict
+import numpy as np
+
+_STARTUP_MARKS['imports'] = time.perf_counter()
+
+# category vocabularies; the position of a category in its list is its int8 code in the vectorized engine
+WEATHER_TYPES = ['cat_1', 'cat_2', 'cat_3']
+WIND_TYPES = ['headwind', 'tailwind', 'crosswind', 'wind_shear']
+AIRCRAFT_WEIGHT_CLASSES = ['light', 'medium', 'heavy', 'super']
+GROUND_TRAFFIC_TYPES = ['low', 'average', 'high']
+AIR_TRAFFIC_CONGESTION_TYPES = ['regular', 'max']
 
 class airplane_attributes:
 
+    # fixed attribute slots instead of a per-instance __dict__ keep every aircraft record compact
+    __slots__ = ('weather', 'wind', 'aircraft_weight_class', 'ground_traffic', 'air_traffic_congestion', 'state')
+
     def __init__(self, weather_decider, wind_decider, weight_decider, ground_traffic_decider, hypotheis_type):
         """
         weather: In aviation, weather at airports is categorised based on the Runway Visibility Range (RVR), or in
@@ -64,11 +93,16 @@ class airplane_attributes:
         if self.ground_traffic == 'average' or self.ground_traffic == 'low':
             self.air_traffic_congestion = 'regular'
 
+        # all sampled attributes encoded as one integer, the index of the aircraft in the compiled pairwise tables
+        self.state = encode_state(self.weather, self.wind, self.aircraft_weight_class, self.ground_traffic)
+
 
 class weather_decider:
 
-    def __init__(self):
-        self.temp_weather = random.choice(['cat_1', 'cat_2', 'cat_3'])
+    def __init__(self, rng=random):
+        # rng: source of the draws, the global random module unless a seeded random.Random is given
+        self.rng = rng
+        self.temp_weather = self.rng.choice(['cat_1', 'cat_2', 'cat_3'])
         self.weather_counter = 0
 
     def get_weather(self):
@@ -76,16 +110,17 @@ class weather_decider:
             Method to randomize weather category for the MC simulation after every 100 flights
         """
         if self.weather_counter % 100 == 0:
-            self.temp_weather = random.choice(['cat_1', 'cat_2', 'cat_3'])
+            self.temp_weather = self.rng.choice(['cat_1', 'cat_2', 'cat_3'])
 
         self.weather_counter += 1
         return self.temp_weather
 
 class wind_decider:
 
-    def __init__(self):
+    def __init__(self, rng=random):
+        self.rng = rng
         # https://pynative.com/python-weighted-random-choices-with-probability/
-        self.temp_wind = random.choices(['headwind', 'tailwind', 'crosswind', 'wind_shear'], weights=(80, 10, 5, 5), k=1)
+        self.temp_wind = self.rng.choices(['headwind', 'tailwind', 'crosswind', 'wind_shear'], weights=(80, 10, 5, 5), k=1)
         self.wind_counter = 0
 
     def get_wind(self):
@@ -94,14 +129,15 @@ class wind_decider:
             been assigned weights.
         """
         if self.wind_counter % 10 == 0:
-            self.temp_wind = random.choices(['headwind', 'tailwind', 'crosswind', 'wind_shear'], weights=(80, 10, 5, 5), k=1)
+            self.temp_wind = self.rng.choices(['headwind', 'tailwind', 'crosswind', 'wind_shear'], weights=(80, 10, 5, 5), k=1)
 
         self.wind_counter += 1
         return self.temp_wind[0]
 
 class weight_decider:
 
-    def __init__(self):
+    def __init__(self, rng=random):
+        self.rng = rng
         self.temp_weight = []
 
     def get_weight(self):
@@ -110,14 +146,15 @@ class weight_decider:
             been assigned weights.
         """
         # https://pynative.com/python-weighted-random-choices-with-probability/
-        self.temp_weight = random.choices(['light', 'medium', 'heavy', 'super'], weights=(5, 60, 30, 5), k=1)
+        self.temp_weight = self.rng.choices(['light', 'medium', 'heavy', 'super'], weights=(5, 60, 30, 5), k=1)
 
         return self.temp_weight[0]
 
 class ground_traffic_decider:
 
-    def __init__(self):
-        self.temp_ground_traffic = random.choice(['low', 'average', 'high'])
+    def __init__(self, rng=random):
+        self.rng = rng
+        self.temp_ground_traffic = self.rng.choice(['low', 'average', 'high'])
         self.ground_traffic_counter = 0
 
     def get_ground_traffic(self):
@@ -125,7 +162,7 @@ class ground_traffic_decider:
         Method to randomize ground traffic type values for the MC simulation after every 20 flights.
         """
         if self.ground_traffic_counter % 20 == 0:
-            self.temp_ground_traffic = random.choice(['low', 'average', 'high'])
+            self.temp_ground_traffic = self.rng.choice(['low', 'average', 'high'])
 
         self.ground_traffic_counter += 1
         return self.temp_ground_traffic
@@ -148,23 +185,7 @@ def calculate_dist_affected_due_weather(weather_1: str, weather_2: str, separati
         >>> calculate_dist_affected_due_weather('cat_1', 'cat_2', 5)
         5.5
     """
-    if weather_1 == weather_2:
-        return separation
-    elif weather_1 == 'cat_1':
-        if weather_2 == 'cat_2':
-            return separation + 0.5
-        else:
-            return separation + 1.5
-    elif weather_1 == 'cat_2':
-        if weather_2 == 'cat_1':
-            return separation - 0.5
-        else:
-            return separation + 1
-    else:
-        if weather_2 == 'cat_1':
-            return separation - 1.5
-        else:
-            return separation - 1
+    return separation + SEPARATION_RULES.delta('hyp_1', weather_1, weather_2)
 
 def calculate_dist_hyp_2(weather_1: str, weather_2: str, separation: float) -> float:
     """
@@ -177,8 +198,9 @@ def calculate_dist_hyp_2(weather_1: str, weather_2: str, separation: float) -> f
         >>> calculate_dist_hyp_2('cat_3', 'cat_3', 5)
         6
     """
-    if weather_1 == weather_2:
-        return separation + 1
+    delta = SEPARATION_RULES.delta('hyp_2', weather_1, weather_2)
+    if delta is not None:
+        return separation + delta
 
 
 def calculate_dist_affected_due_wind(wind_1: str, wind_2: str, separation: float) -> float:
@@ -205,36 +227,7 @@ def calculate_dist_affected_due_wind(wind_1: str, wind_2: str, separation: float
         >>> calculate_dist_affected_due_wind('headwind', 'crosswind', 5.5)
         5.1
     """
-    if wind_1 == wind_2:
-        return separation
-    elif wind_1 == 'headwind':
-        if wind_2 == 'tailwind':
-            return separation - 0.2
-        elif wind_2 == 'crosswind':
-            return separation - 0.4
-        else:
-            return separation - 0.6
-    elif wind_1 == 'tailwind':
-        if wind_2 == 'headwind':
-            return separation + 0.2
-        elif wind_2 == 'crosswind':
-            return separation - 0.2
-        else:
-            return separation - 0.4
-    elif wind_1 == 'crosswind':
-        if wind_2 == 'headwind':
-            return separation + 0.4
-        elif wind_2 == 'tailwind':
-            return separation + 0.2
-        else:
-            return separation - 0.2
-    else:
-        if wind_2 == 'headwind':
-            return separation + 0.6
-        elif wind_2 == 'tailwind':
-            return separation + 0.4
-        else:
-            return separation + 0.2
+    return separation + SEPARATION_RULES.delta('wind', wind_1, wind_2)
 
 def calculate_dist_affected_due_aircraft_weight_class(aircraft_weight_class_1: str, aircraft_weight_class_2: str, separation: float) -> float:
     """
@@ -260,36 +253,7 @@ def calculate_dist_affected_due_aircraft_weight_class(aircraft_weight_class_1: s
         >>> calculate_dist_affected_due_aircraft_weight_class('heavy', 'super', 5.1)
         3.3
     """
-    if aircraft_weight_class_1 == aircraft_weight_class_2:
-        return separation
-    elif aircraft_weight_class_1 == 'light':
-        if aircraft_weight_class_2 == 'medium':
-            return separation - 1.8
-        elif aircraft_weight_class_2 == 'heavy':
-            return separation - 1.9
-        else:
-            return separation - 2
-    elif aircraft_weight_class_1 == 'medium':
-        if aircraft_weight_class_2 == 'light':
-            return separation + 0.4
-        elif aircraft_weight_class_2 == 'heavy':
-            return separation - 1.8
-        else:
-            return separation - 2
-    elif aircraft_weight_class_1 == 'heavy':
-        if aircraft_weight_class_2 == 'light':
-            return separation + 1.5
-        elif aircraft_weight_class_2 == 'medium':
-            return separation + 0.4
-        else:
-            return separation - 1.8
-    else:
-        if aircraft_weight_class_2 == 'light':
-            return separation + 3
-        elif aircraft_weight_class_2 == 'medium':
-            return separation + 2
-        else:
-            return separation + 1.5
+    return separation + SEPARATION_RULES.delta('aircraft_weight_class', aircraft_weight_class_1, aircraft_weight_class_2)
 
 def calculate_dist_affected_due_ground_traffic(ground_traffic_1: str, ground_traffic_2: str, separation: float) -> float:
     """
@@ -309,23 +273,7 @@ def calculate_dist_affected_due_ground_traffic(ground_traffic_1: str, ground_tra
         >>> calculate_dist_affected_due_ground_traffic('average', 'high', 3.3)
         3.5
     """
-    if ground_traffic_1 == ground_traffic_2:
-        return separation
-    elif ground_traffic_1 == 'low':
-        if ground_traffic_2 == 'average':
-            return separation + 0.2
-        else:
-            return separation + 0.4
-    elif ground_traffic_1 == 'average':
-        if ground_traffic_2 == 'low':
-            return separation - 0.2
-        else:
-            return separation + 0.2
-    else:
-        if ground_traffic_2 == 'low':
-            return separation - 0.4
-        else:
-            return separation - 0.2
+    return separation + SEPARATION_RULES.delta('ground_traffic', ground_traffic_1, ground_traffic_2)
 
 def calculate_dist_affected_due_air_traffic_congestion(air_traffic_congestion_1: str, air_traffic_congestion_2: str, separation: float) -> float:
     """
@@ -341,97 +289,2701 @@ def calculate_dist_affected_due_air_traffic_congestion(air_traffic_congestion_1:
         >>> calculate_dist_affected_due_air_traffic_congestion('max', 'regular', 3.5)
         3.2
     """
-    if air_traffic_congestion_1 == air_traffic_congestion_2:
-        return separation
-    elif air_traffic_congestion_1 == 'regular':
-        return separation + 0.3
+    return separation + SEPARATION_RULES.delta('air_traffic_congestion', air_traffic_congestion_1, air_traffic_congestion_2)
+
+
+# randomized factors in the order they are sampled and scored; air_traffic_congestion is derived from ground_traffic
+SAMPLED_FACTORS = ('weather', 'wind', 'aircraft_weight_class', 'ground_traffic')
+FACTOR_TYPES = {'weather': WEATHER_TYPES, 'wind': WIND_TYPES, 'aircraft_weight_class': AIRCRAFT_WEIGHT_CLASSES,
+                'ground_traffic': GROUND_TRAFFIC_TYPES, 'air_traffic_congestion': AIR_TRAFFIC_CONGESTION_TYPES}
+
+
+@dataclass(frozen=True)
+class model_parameters:
+    """
+        Knobs of the landing sequence model. The defaults reproduce the decider classes above:
+            separation_minima: recommended separation minima according to ICAO (5 NM)
+            *_weights: relative probability of each category, in the order of the matching vocabulary list
+            *_period: number of aircraft after which the category is redrawn (1 = drawn for every aircraft)
+            rules_file: JSON file of separation rules (see separation_rules.json), the shipped rules if not given
+        >>> model_parameters(wind_weights=(80, 10, 5))
+        Traceback (most recent call last):
+        ...
+        ValueError: wind_weights needs one weight per category of headwind, tailwind, crosswind, wind_shear
+        >>> model_parameters(ground_traffic_weights=(0, 0, 0))
+        Traceback (most recent call last):
+        ...
+        ValueError: ground_traffic_weights must be non-negative with a positive sum
+        >>> model_parameters(weather_period=2.5)
+        Traceback (most recent call last):
+        ...
+        ValueError: weather_period must be an integer of at least 1
+    """
+    separation_minima: float = 5
+    weather_weights: tuple = (1, 1, 1)
+    wind_weights: tuple = (80, 10, 5, 5)
+    aircraft_weight_class_weights: tuple = (5, 60, 30, 5)
+    ground_traffic_weights: tuple = (1, 1, 1)
+    weather_period: int = 100
+    wind_period: int = 10
+    aircraft_weight_class_period: int = 1
+    ground_traffic_period: int = 20
+    rules_file: str = None
+
+    def __post_init__(self):
+        for factor in SAMPLED_FACTORS:
+            weights = getattr(self, factor + '_weights')
+            if len(weights) != len(FACTOR_TYPES[factor]):
+                raise ValueError("{}_weights needs one weight per category of {}"
+                                 .format(factor, ', '.join(FACTOR_TYPES[factor])))
+            weights = np.asarray(weights, dtype=np.float64)
+            if not (np.all(np.isfinite(weights)) and np.all(weights >= 0) and weights.sum() > 0):
+                raise ValueError("{}_weights must be non-negative with a positive sum".format(factor))
+            period = getattr(self, factor + '_period')
+            if isinstance(period, bool) or not isinstance(period, (int, np.integer)) or period < 1:
+                raise ValueError("{}_period must be an integer of at least 1".format(factor))
+
+
+DEFAULT_PARAMETERS = model_parameters()
+
+# air_traffic_congestion code for every ground_traffic code: high -> max, average or low -> regular
+GROUND_TRAFFIC_TO_CONGESTION = np.array([1 if ground_traffic == 'high' else 0 for ground_traffic in GROUND_TRAFFIC_TYPES],
+                                        dtype=np.int8)
+
+
+# separation rules shipped with the model; alternative rule files can be selected through model_parameters.rules_file
+DEFAULT_RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'separation_rules.json')
+
+# delta tables applied to a pair, in the order of the chained calculate_dist_* calls (weather table per hypothesis)
+SCORED_TABLES = ('wind', 'aircraft_weight_class', 'ground_traffic', 'air_traffic_congestion')
+
+# aircraft state: the sampled factor codes combined into one integer, air_traffic_congestion follows ground_traffic
+STATE_SHAPE = tuple(len(FACTOR_TYPES[factor]) for factor in SAMPLED_FACTORS)
+N_STATES = math.prod(STATE_SHAPE)
+
+
+class compiled_rules:
+
+    def __init__(self, rules: dict, source: str = None):
+        """
+            Separation rules compiled from their declarative form (see separation_rules.json). Every table gives the
+            change in separation minima for a (current, next) pair of categories of one factor. The tables are
+            compiled into
+                transitions: {table: {(category_1, category_2): delta}} for scoring single pairs of strings,
+                tables: {table: float64 matrix indexed by category codes}, nan where the rule is undefined,
+            and, on demand, a combined pairwise table indexed by the encoded states of both flights, so that
+            scoring a pair is a single lookup.
+            :param rules: parsed rule file
+            :param source: path the rules were loaded from
+            >>> with open(DEFAULT_RULES_FILE) as file:
+            ...     rules = json.load(file)
+            >>> compiled_rules({'tables': dict(rules['tables'], hyp_1=rules['tables']['wind'])})
+            Traceback (most recent call last):
+            ...
+            ValueError: rule table 'hyp_1' must be a weather table, not wind
+            >>> compiled_rules({'tables': dict(rules['tables'], wind=dict(rules['tables']['wind'],
+            ...                                                           deltas=rules['tables']['wind']['deltas'][:3]))})
+            Traceback (most recent call last):
+            ...
+            ValueError: rule table 'wind' must have 4 x 4 deltas
+        """
+        self.source = source
+        self.transitions = {}
+        self.tables = {}
+        # tables scored by the model must describe the factor they are applied to
+        expected_factors = dict({"hyp_1": 'weather', "hyp_2": 'weather'}, **{name: name for name in SCORED_TABLES})
+        for name, rule in rules['tables'].items():
+            factor = rule['factor']
+            if factor not in FACTOR_TYPES:
+                raise ValueError("rule table '{}' has unknown factor {}".format(name, factor))
+            if name in expected_factors and factor != expected_factors[name]:
+                raise ValueError("rule table '{}' must be a {} table, not {}".format(name, expected_factors[name],
+                                                                                    factor))
+            if rule['categories'] != FACTOR_TYPES[factor]:
+                raise ValueError("rule table '{}' must list the {} categories {}".format(name, factor,
+                                                                                        FACTOR_TYPES[factor]))
+            size = len(rule['categories'])
+            if len(rule['deltas']) != size or any(len(row) != size for row in rule['deltas']):
+                raise ValueError("rule table '{}' must have {} x {} deltas".format(name, size, size))
+            self.transitions[name] = {(category_1, category_2): delta
+                                      for category_1, row in zip(rule['categories'], rule['deltas'])
+                                      for category_2, delta in zip(rule['categories'], row)}
+            self.tables[name] = np.array([[np.nan if delta is None else delta for delta in row]
+                                          for row in rule['deltas']], dtype=np.float64)
+        missing = {"hyp_1", "hyp_2", *SCORED_TABLES} - set(self.tables)
+        if missing:
+            raise ValueError("rule tables missing: {}".format(', '.join(sorted(missing))))
+        self._pair_tables = {}
+
+    def delta(self, name: str, category_1: str, category_2: str):
+        """
+            Change in separation minima from one rule table, None where the rule is undefined.
+        """
+        return self.transitions[name][(category_1, category_2)]
+
+    def pair_table(self, hypothesis_type: str = "hyp_1",
+                   separation_minima: float = DEFAULT_PARAMETERS.separation_minima) -> np.ndarray:
+        """
+            Separation minima of every (current, next) pair of aircraft states, built by applying the tables in
+            the same order as the chained calculate_dist_* calls, so a lookup gives the same float as the chain.
+            :param hypothesis_type: "hyp_1" or "hyp_2", selects the weather table
+            :param separation_minima: default separation minima defined (5 NM)
+            :return: N_STATES x N_STATES float64 array
+            >>> table = SEPARATION_RULES.pair_table("hyp_1")
+            >>> table.shape, float(table[encode_state('cat_1', 'headwind', 'heavy', 'average'),
+            ...                          encode_state('cat_2', 'crosswind', 'super', 'high')])
+            ((144, 144), 3.8)
+        """
+        key = (hypothesis_type, separation_minima)
+        if key not in self._pair_tables:
+            codes = dict(zip(SAMPLED_FACTORS, np.unravel_index(np.arange(N_STATES), STATE_SHAPE)))
+            codes['air_traffic_congestion'] = GROUND_TRAFFIC_TO_CONGESTION[codes['ground_traffic']]
+            table = np.full((N_STATES, N_STATES), separation_minima, dtype=np.float64)
+            table += self.tables[hypothesis_type][codes['weather'][:, None], codes['weather'][None, :]]
+            for name in SCORED_TABLES:
+                table += self.tables[name][codes[name][:, None], codes[name][None, :]]
+            table.flags.writeable = False
+            self._pair_tables[key] = table
+        return self._pair_tables[key]
+
+    def score(self, sequence: dict, hypothesis_type: str = "hyp_1",
+              separation_minima: float = DEFAULT_PARAMETERS.separation_minima) -> np.ndarray:
+        """
+            Separation minima of every consecutive pair of a sampled landing sequence, one lookup per pair.
+        """
+        states = encode_states(sequence)
+        return self.pair_table(hypothesis_type, separation_minima)[states[:-1], states[1:]]
+
+
+def encode_state(weather: str, wind: str, aircraft_weight_class: str, ground_traffic: str) -> int:
+    """
+        Encodes the sampled attributes of an aircraft as one integer in range(N_STATES).
+        >>> encode_state('cat_1', 'headwind', 'light', 'low'), encode_state('cat_3', 'wind_shear', 'super', 'high')
+        (0, 143)
+    """
+    return (((CATEGORY_CODES['weather'][weather] * STATE_SHAPE[1] + CATEGORY_CODES['wind'][wind]) * STATE_SHAPE[2]
+             + CATEGORY_CODES['aircraft_weight_class'][aircraft_weight_class]) * STATE_SHAPE[3]
+            + CATEGORY_CODES['ground_traffic'][ground_traffic])
+
+
+def encode_states(sequence: dict) -> np.ndarray:
+    """
+        Encodes the code arrays of a sampled landing sequence as one int16 state per aircraft.
+    """
+    states = sequence['weather'].astype(np.int16)
+    for factor, radix in zip(SAMPLED_FACTORS[1:], STATE_SHAPE[1:]):
+        states *= radix
+        states += sequence[factor]
+    return states
+
+
+def load_separation_rules(path: str = None) -> compiled_rules:
+    """
+        Loads and compiles a separation rule file.
+        :param path: JSON rule file, the rules shipped with the model if not given
+        :return: compiled_rules
+    """
+    path = path or DEFAULT_RULES_FILE
+    with open(path) as rule_file:
+        return compiled_rules(json.load(rule_file), path)
+
+
+@functools.lru_cache(maxsize=None)
+def get_separation_rules(path: str = None) -> compiled_rules:
+    """
+        Compiled rules of a rule file, loaded once per process.
+    """
+    return load_separation_rules(path)
+
+
+SEPARATION_RULES = get_separation_rules()
+
+
+class run_instrumentation:
+
+    def __init__(self, enabled: bool = True):
+        """
+            Per-stage timers and counters of a simulation run. Every stage entered through stage() accumulates its
+            number of calls, wall clock and CPU time (nested stages are timed inclusively), and count() keeps
+            throughput counters such as pairs scored, rows exported and bytes written. Hooks, callables taking
+            (event, stage name, timing), are called with event 'start' and timing None when a stage is entered, and
+            with 'stop' and (wall, cpu) seconds when it is left, so that a profiler or a custom callback can attach
+            to the hot path. A disabled instance hands out a shared no-op context and ignores counts.
+            :param enabled: whether timings and counts are collected
+            >>> instrumentation = run_instrumentation()
+            >>> with instrumentation.stage('score'):
+            ...     instrumentation.count('pairs_scored', 1000)
+            >>> report = instrumentation.report()
+            >>> report['stages']['score']['calls'], report['counters']['pairs_scored']
+            (1, 1000)
+            >>> disabled = run_instrumentation(enabled=False)
+            >>> with disabled.stage('score'):
+            ...     disabled.count('pairs_scored', 1000)
+            >>> disabled.report()['stages'], disabled.report()['counters']
+            ({}, {})
+        """
+        self.enabled = enabled
+        self.stages = {}
+        self.counters = {}
+        self.hooks = []
+        self._started = (time.perf_counter(), time.process_time())
+
+    def stage(self, name: str):
+        """
+            Context manager timing one pass through a stage.
+        """
+        if not self.enabled:
+            return _NO_STAGE
+        return _stage_timer(self, name)
+
+    def count(self, name: str, amount: int = 1):
+        """
+            Adds amount to a counter.
+        """
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_time(self, name: str, wall: float, cpu: float, calls: int = 1):
+        """
+            Adds timings measured by the caller to a stage, without calling the hooks.
+        """
+        totals = self.stages.setdefault(name, [0, 0.0, 0.0])
+        totals[0] += calls
+        totals[1] += wall
+        totals[2] += cpu
+
+    def add_hook(self, hook):
+        """
+            Registers a callable hook(event, stage, timing), e.g. profiler_hook(cProfile.Profile()).
+        """
+        self.hooks.append(hook)
+        return hook
+
+    def report(self) -> dict:
+        """
+            Timings and counters collected so far as a JSON serializable dict. Rates are counters per second of
+            wall clock time since the instrumentation was created.
+        """
+        wall = time.perf_counter() - self._started[0]
+        return {'wall_seconds': wall,
+                'cpu_seconds': time.process_time() - self._started[1],
+                'stages': {name: {'calls': calls, 'wall_seconds': stage_wall, 'cpu_seconds': stage_cpu}
+                           for name, (calls, stage_wall, stage_cpu) in self.stages.items()},
+                'counters': dict(self.counters),
+                'rates': {name + '_per_second': value / wall for name, value in self.counters.items() if wall > 0}}
+
+    def write_report(self, path: str) -> dict:
+        """
+            Writes the report to a JSON file and returns it.
+        """
+        report = self.report()
+        with open(path, 'w') as file:
+            json.dump(report, file, indent=2)
+        return report
+
+
+class _stage_timer:
+
+    __slots__ = ('instrumentation', 'name', '_wall', '_cpu')
+
+    def __init__(self, instrumentation: run_instrumentation, name: str):
+        self.instrumentation = instrumentation
+        self.name = name
+
+    def __enter__(self):
+        for hook in self.instrumentation.hooks:
+            hook('start', self.name, None)
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, *exc_info):
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        self.instrumentation.add_time(self.name, wall, cpu)
+        for hook in self.instrumentation.hooks:
+            hook('stop', self.name, (wall, cpu))
+
+
+# shared context of disabled stages, so instrumented code costs one method call per stage when profiling is off
+_NO_STAGE = contextlib.nullcontext()
+
+# instrumentation of the running process, disabled unless a run is wrapped in instrumented_run
+INSTRUMENTATION = run_instrumentation(enabled=False)
+
+
+@contextlib.contextmanager
+def instrumented_run(hooks: tuple = ()):
+    """
+        Enables instrumentation of the engines for the duration of a with block and yields the run_instrumentation
+        collecting it. Only the calling process is measured, work done in worker processes is not.
+        :param hooks: hooks registered on the instrumentation
+        >>> with instrumented_run() as instrumentation:
+        ...     separations = run_vectorized_hypothesis(1000, "hyp_1", np.random.default_rng(0))
+        >>> report = instrumentation.report()
+        >>> sorted(report['stages']), report['counters']['pairs_scored']
+        (['sample', 'score', 'statistics'], 999)
+        >>> INSTRUMENTATION.enabled
+        False
+    """
+    global INSTRUMENTATION
+    previous = INSTRUMENTATION
+    INSTRUMENTATION = run_instrumentation()
+    for hook in hooks:
+        INSTRUMENTATION.add_hook(hook)
+    try:
+        yield INSTRUMENTATION
+    finally:
+        INSTRUMENTATION = previous
+
+
+def profiler_hook(profiler, stages: tuple = None):
+    """
+        Hook attaching a profiler with enable/disable methods, such as cProfile.Profile, to some stages (all stages
+        if not given). The profiler runs while any of them is active.
+        >>> import cProfile, pstats
+        >>> profiler = cProfile.Profile()
+        >>> with instrumented_run([profiler_hook(profiler, ('score',))]):
+        ...     separations = run_vectorized_hypothesis(1000, "hyp_1", np.random.default_rng(0))
+        >>> functions = {function for file, line, function in pstats.Stats(profiler).stats}
+        >>> 'score' in functions, 'sample_block_codes' in functions
+        (True, False)
+    """
+    depth = [0]
+
+    def hook(event, stage, timing):
+        if stages is not None and stage not in stages:
+            return
+        if event == 'start':
+            depth[0] += 1
+            if depth[0] == 1:
+                profiler.enable()
+        else:
+            depth[0] -= 1
+            if depth[0] == 0:
+                profiler.disable()
+    return hook
+
+
+def _category_cdf(weights: tuple) -> np.ndarray:
+    """
+        Cumulative distribution of a weighted categorical draw, without the final 1.0, so that
+        np.searchsorted(cdf, u, side='right') maps a uniform u in [0, 1) to a category code.
+        :param weights: relative weights in the order of the factor vocabulary
+        :return: cumulative probabilities of all but the last category
+        >>> _category_cdf((5, 60, 30, 5)).tolist()
+        [0.05, 0.65, 0.95]
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    return np.cumsum(weights / weights.sum())[:-1]
+
+
+def sample_block_codes(uniforms: np.ndarray, weights: tuple, period: int, n_aircraft: int) -> np.ndarray:
+    """
+        Turns one uniform draw per block of `period` aircraft into an int8 category code for every aircraft,
+        the array equivalent of the decider classes redrawing their category when their counter hits the period.
+        :param uniforms: uniform [0, 1) draws, one per block
+        :param weights: relative weights of the categories
+        :param period: number of aircraft sharing a draw
+        :param n_aircraft: number of aircraft in the sequence
+        :return: int8 array of category codes of length n_aircraft
+        >>> sample_block_codes(np.array([0.1, 0.7]), (1, 1, 1), 3, 5).tolist()
+        [0, 0, 0, 2, 2]
+    """
+    block_codes = np.searchsorted(_category_cdf(weights), uniforms, side='right').astype(np.int8)
+    if period == 1:
+        return block_codes[:n_aircraft]
+    return np.repeat(block_codes, period)[:n_aircraft]
+
+
+def _blocks_starting(n_aircraft: int, period: int, start: int = 0) -> int:
+    """
+        Number of blocks of `period` aircraft starting within a chunk of n_aircraft aircraft beginning at global
+        index start, blocks starting at multiples of the period.
+        >>> _blocks_starting(1000, 100), _blocks_starting(1000, 100, 950), _blocks_starting(30, 100, 950)
+        (10, 10, 0)
+    """
+    return max(0, -(-(n_aircraft - (-start % period)) // period))
+
+
+def _continue_blocks(block_uniforms: np.ndarray, weights: tuple, period: int, n_aircraft: int, start: int,
+                     carried: int) -> np.ndarray:
+    """
+        Category codes of a chunk of n_aircraft aircraft beginning at global index start. The aircraft before the
+        first block starting in the chunk continue the last block of the previous chunk and take its code carried.
+        >>> _continue_blocks(np.array([0.9]), (1, 1, 1), 3, 5, 1, 0).tolist()
+        [0, 0, 2, 2, 2]
+    """
+    phase = min(-start % period, n_aircraft)
+    codes = np.empty(n_aircraft, dtype=np.int8)
+    codes[:phase] = carried
+    codes[phase:] = sample_block_codes(block_uniforms, weights, period, n_aircraft - phase)
+    return codes
+
+
+def sample_landing_sequence(n_aircraft: int, hypothesis_type: str = "hyp_1", rng: np.random.Generator = None,
+                            params: model_parameters = DEFAULT_PARAMETERS, start: int = 0,
+                            previous: dict = None) -> dict:
+    """
+        Samples the conditions of a whole landing sequence, or of one chunk of it, in one batch. Weather, wind and
+        ground traffic keep their category for blocks of params.*_period aircraft, weight class is drawn for every
+        aircraft and air traffic congestion is derived from ground traffic, as in airplane_attributes. For
+        hypothesis 2 the weather is category 3 for all flights. Blocks follow the global aircraft index, so a chunk
+        may start inside a block: one draw is taken per block starting in the chunk, and the aircraft before the
+        first of them continue the block of the last aircraft of the previous chunk.
+        :param n_aircraft: number of aircraft in the sequence
+        :param hypothesis_type: "hyp_1" or "hyp_2"
+        :param rng: numpy random generator, a fresh unseeded one is used if not given
+        :param params: model parameters
+        :param start: index of the first aircraft of the chunk in the landing sequence
+        :param previous: code arrays of the previous chunk (or its last aircraft), needed if start is not 0
+        :return: dict of int8 code arrays of length n_aircraft, keyed by factor name
+        >>> sequence = sample_landing_sequence(250, "hyp_2", np.random.default_rng(1))
+        >>> sorted(sequence)
+        ['air_traffic_congestion', 'aircraft_weight_class', 'ground_traffic', 'weather', 'wind']
+        >>> set(sequence['weather'].tolist()), len(set(sequence['wind'][:10].tolist()))
+        ({2}, 1)
+        >>> following = sample_landing_sequence(10, "hyp_2", np.random.default_rng(1), start=250, previous=sequence)
+        >>> following['ground_traffic'].tolist() == sequence['ground_traffic'][-10:].tolist()
+        True
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    with INSTRUMENTATION.stage('sample'):
+        block_uniforms = {factor: rng.random(_blocks_starting(n_aircraft, getattr(params, factor + '_period'), start))
+                          for factor in SAMPLED_FACTORS if not (factor == 'weather' and hypothesis_type == "hyp_2")}
+        sequence = landing_sequence_from_uniforms(block_uniforms, n_aircraft, hypothesis_type, params,
+                                                  start=start, previous=previous)
+    INSTRUMENTATION.count('aircraft_sampled', n_aircraft)
+    return sequence
+
+
+def landing_sequence_from_uniforms(block_uniforms: dict, n_aircraft: int, hypothesis_type: str = "hyp_1",
+                                   params: model_parameters = DEFAULT_PARAMETERS, weights: dict = None,
+                                   start: int = 0, previous: dict = None) -> dict:
+    """
+        Builds the code arrays of a landing sequence from given uniform draws, one per block of every sampled
+        factor, so that callers can control the draws (common, antithetic or stratified random numbers).
+        :param block_uniforms: dict of uniform [0, 1) arrays keyed by factor, weather is not used for hypothesis 2
+        :param n_aircraft: number of aircraft in the sequence
+        :param hypothesis_type: "hyp_1" or "hyp_2"
+        :param params: model parameters
+        :param weights: optional dict of category weights replacing those of params for some factors
+        :param start: index of the first aircraft of the chunk in the landing sequence
+        :param previous: code arrays of the previous chunk, whose last codes continue into this one
+        :return: dict of int8 code arrays of length n_aircraft, keyed by factor name
+        >>> landing_sequence_from_uniforms({'weather': [0.9], 'wind': [0.85], 'aircraft_weight_class': [0.01, 0.99],
+        ...                                 'ground_traffic': [0.5]}, 2)['aircraft_weight_class'].tolist()
+        [0, 3]
+    """
+    weights = weights or {}
+    sequence = {}
+    for factor in SAMPLED_FACTORS:
+        if factor == 'weather' and hypothesis_type == "hyp_2":
+            sequence[factor] = np.full(n_aircraft, WEATHER_TYPES.index('cat_3'), dtype=np.int8)
+            continue
+        period = getattr(params, factor + '_period')
+        if start % period and previous is None:
+            raise ValueError("a chunk starting inside a block of {} needs the codes of the previous chunk"
+                             .format(factor))
+        sequence[factor] = _continue_blocks(block_uniforms[factor],
+                                            weights.get(factor, getattr(params, factor + '_weights')), period,
+                                            n_aircraft, start, previous[factor][-1] if start % period else 0)
+    sequence['air_traffic_congestion'] = GROUND_TRAFFIC_TO_CONGESTION[sequence['ground_traffic']]
+    return sequence
+
+
+def score_landing_sequence(sequence: dict, hypothesis_type: str = "hyp_1",
+                           separation_minima: float = DEFAULT_PARAMETERS.separation_minima,
+                           rules: compiled_rules = None) -> np.ndarray:
+    """
+        Calculates the separation minima (in NM) of every consecutive pair of a sampled landing sequence with one
+        lookup per pair in the compiled pairwise table, indexed by the encoded states of both flights.
+        :param sequence: dict of code arrays as returned by sample_landing_sequence
+        :param hypothesis_type: "hyp_1" or "hyp_2", selects the weather rule
+        :param separation_minima: default separation minima defined (5 NM)
+        :param rules: compiled separation rules, the shipped rules if not given
+        :return: float64 array of length n_aircraft - 1
+        >>> sequence = {'weather': np.array([0, 1]), 'wind': np.array([0, 2]), 'aircraft_weight_class': np.array([2, 3]),
+        ...             'ground_traffic': np.array([1, 2]), 'air_traffic_congestion': np.array([0, 1])}
+        >>> score_landing_sequence(sequence).tolist() == [calculate_dist_affected_due_air_traffic_congestion('regular',
+        ...     'max', calculate_dist_affected_due_ground_traffic('average', 'high',
+        ...     calculate_dist_affected_due_aircraft_weight_class('heavy', 'super',
+        ...     calculate_dist_affected_due_wind('headwind', 'crosswind',
+        ...     calculate_dist_affected_due_weather('cat_1', 'cat_2', 5)))))]
+        True
+    """
+    with INSTRUMENTATION.stage('score'):
+        separations = (rules or SEPARATION_RULES).score(sequence, hypothesis_type, separation_minima)
+    INSTRUMENTATION.count('pairs_scored', len(separations))
+    return separations
+
+
+def iterate_landing_sequence(n_aircraft: int, hypothesis_type: str = "hyp_1", rng: np.random.Generator = None,
+                             params: model_parameters = DEFAULT_PARAMETERS, chunk_size: int = 1_000_000):
+    """
+        Simulates a landing sequence of any length in chunks of bounded size. Every chunk after the first is
+        prefixed with the last aircraft of the previous chunk, so that the separations it yields cover exactly the
+        consecutive pairs of its codes.
+        :param n_aircraft: number of aircraft in the sequence
+        :param hypothesis_type: "hyp_1" or "hyp_2"
+        :param rng: numpy random generator
+        :param params: model parameters
+        :param chunk_size: aircraft per chunk, chunks need not be aligned to the redraw periods
+        :return: generator of (sequence, separations) tuples
+        >>> chunks = list(iterate_landing_sequence(2500, rng=np.random.default_rng(7), chunk_size=1000))
+        >>> [(len(sequence['wind']), len(separations)) for sequence, separations in chunks]
+        [(1000, 999), (1001, 1000), (501, 500)]
+        >>> chunks = list(iterate_landing_sequence(2500, rng=np.random.default_rng(7), chunk_size=999))
+        >>> weather = np.concatenate([chunks[0][0]['weather']] + [sequence['weather'][1:] for sequence, _ in chunks[1:]])
+        >>> len(chunks), all(len(set(weather[i:i + 100].tolist())) == 1 for i in range(0, 2500, 100))
+        (3, True)
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    rules = get_separation_rules(params.rules_file)
+    previous = None
+    for start in range(0, n_aircraft, chunk_size):
+        sequence = sample_landing_sequence(min(chunk_size, n_aircraft - start), hypothesis_type, rng, params, start,
+                                           previous)
+        if previous is None:
+            scored = sequence
+        else:
+            scored = {factor: np.concatenate((previous[factor], codes)) for factor, codes in sequence.items()}
+        yield scored, score_landing_sequence(scored, hypothesis_type, params.separation_minima, rules)
+        previous = {factor: codes[-1:] for factor, codes in sequence.items()}
+
+
+def run_vectorized_hypothesis(n_aircraft: int, hypothesis_type: str = "hyp_1", rng: np.random.Generator = None,
+                              params: model_parameters = DEFAULT_PARAMETERS, chunk_size: int = 1_000_000) -> float:
+    """
+        Average separation minima (in NM) over all consecutive pairs of a landing sequence, simulated with the
+        vectorized engine. Memory use is bounded by the chunk size, so runs of 10^8+ aircraft are possible.
+        :param n_aircraft: number of aircraft in the sequence
+        :param hypothesis_type: "hyp_1" or "hyp_2"
+        :param rng: numpy random generator
+        :param params: model parameters
+        :param chunk_size: aircraft simulated per batch
+        :return: average separation minima in NM
+        >>> 4 < run_vectorized_hypothesis(100_000, "hyp_1", np.random.default_rng(3)) < 5.5
+        True
+    """
+    return simulate_separation_statistics(n_aircraft, hypothesis_type, rng, params, chunk_size).mean
+
+
+class separation_statistics:
+
+    def __init__(self, low: float = 0.0, high: float = 15.0, bin_width: float = 0.1):
+        """
+            Constant memory, single pass statistics of separation minima: count, mean and variance (Welford, with
+            Chan's update for batches and merges), min, max and a fixed-bin histogram. The histogram bins are
+            centred on multiples of bin_width, and every separation of the model is a multiple of 0.1 NM, so with
+            the default bins the histogram and the quantiles read from it are exact. Accumulators of parallel shards
+            are combined with merge.
+            :param low: centre of the first histogram bin
+            :param high: centre of the last histogram bin
+            :param bin_width: width of the histogram bins
+            >>> stats = separation_statistics()
+            >>> stats.update(np.array([4.6, 5.2, 2.8]))
+            >>> stats.update(5.0)
+            >>> stats.count, round(stats.mean, 6), stats.min, stats.max, stats.quantile(0.5), stats.fraction_below(3)
+            (4, 4.4, 2.8, 5.2, 4.6, 0.25)
+        """
+        self.low = low
+        self.bin_width = bin_width
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        # bins 1..n_bins hold the histogram, bin 0 counts underflow and the last bin overflow
+        self.histogram = np.zeros(round((high - low) / bin_width) + 3, dtype=np.int64)
+
+    @property
+    def variance(self) -> float:
+        return self._m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    def _bins(self, values):
+        return np.clip(np.floor((values - self.low) / self.bin_width + 1.5), 0, len(self.histogram) - 1).astype(np.intp)
+
+    def _combine(self, count: int, mean: float, m2: float):
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self._m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    def update(self, values):
+        """
+            Adds one separation or an array of separations.
+        """
+        if isinstance(values, (int, float)) or np.ndim(values) == 0:
+            # Welford's update for a single value
+            # https://en.wikipedia.org/wiki/Algorithms_for_calculating_variance#Welford's_online_algorithm
+            value = float(values)
+            self.count += 1
+            delta = value - self.mean
+            self.mean += delta / self.count
+            self._m2 += delta * (value - self.mean)
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+            self.histogram[min(max(int(math.floor((value - self.low) / self.bin_width + 1.5)), 0),
+                               len(self.histogram) - 1)] += 1
+            return
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        with INSTRUMENTATION.stage('statistics'):
+            batch_mean = float(values.mean())
+            self._combine(len(values), batch_mean, float(((values - batch_mean) ** 2).sum()))
+            self.min = min(self.min, float(values.min()))
+            self.max = max(self.max, float(values.max()))
+            self.histogram += np.bincount(self._bins(values), minlength=len(self.histogram))
+
+    def update_counts(self, values, counts):
+        """
+            Adds separations given as distinct values and the number of pairs having each, without expanding them
+            into one value per pair.
+            :param values: separation values
+            :param counts: number of occurrences of every value
+            >>> weighted, expanded = separation_statistics(), separation_statistics()
+            >>> weighted.update_counts(np.array([4.6, 2.8, 5.0]), np.array([3, 1, 0]))
+            >>> expanded.update(np.array([4.6, 4.6, 4.6, 2.8]))
+            >>> def key(stats):
+            ...     return stats.count, round(stats.mean, 9), round(stats.variance, 9), stats.min, stats.max, stats.quantile(0.5)
+            >>> key(weighted) == key(expanded)
+            True
+        """
+        values = np.asarray(values, dtype=np.float64)
+        counts = np.asarray(counts, dtype=np.int64)
+        observed = counts > 0
+        values, counts = values[observed], counts[observed]
+        if len(values) == 0:
+            return
+        with INSTRUMENTATION.stage('statistics'):
+            total = int(counts.sum())
+            batch_mean = float(np.dot(counts, values) / total)
+            self._combine(total, batch_mean, float(np.dot(counts, (values - batch_mean) ** 2)))
+            self.min = min(self.min, float(values.min()))
+            self.max = max(self.max, float(values.max()))
+            # integer accumulation keeps the histogram exact for any count
+            np.add.at(self.histogram, self._bins(values), counts)
+
+    def merge(self, other: 'separation_statistics') -> 'separation_statistics':
+        """
+            Adds the separations summarized by another accumulator with the same bins.
+            >>> a, b, c = separation_statistics(), separation_statistics(), separation_statistics()
+            >>> a.update(np.array([4.6, 5.2])); b.update(np.array([2.8, 5.0])); c.update(np.array([4.6, 5.2, 2.8, 5.0]))
+            >>> merged = a.merge(b)
+            >>> round(merged.variance - c.variance, 12), merged.histogram.tolist() == c.histogram.tolist()
+            (0.0, True)
+        """
+        if other.count:
+            self._combine(other.count, other.mean, other._m2)
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self.histogram += other.histogram
+        return self
+
+    def bin_centres(self) -> np.ndarray:
+        """
+            Centres of the histogram bins, nan for the underflow and overflow bins.
+        """
+        centres = self.low + self.bin_width * np.arange(-1, len(self.histogram) - 1)
+        centres[[0, -1]] = np.nan
+        return centres
+
+    def quantile(self, q: float) -> float:
+        """
+            Separation below which a share q of the pairs lie, to the resolution of the histogram bins.
+        """
+        rank = q * self.count
+        bin_index = min(int(np.searchsorted(np.cumsum(self.histogram), rank, side='left')), len(self.histogram) - 1)
+        if bin_index == 0:
+            return self.min
+        if bin_index == len(self.histogram) - 1:
+            return self.max
+        return round(float(self.bin_centres()[bin_index]), 9)
+
+    def fraction_below(self, threshold: float) -> float:
+        """
+            Share of the pairs with a separation strictly less than threshold NM, to the resolution of the bins.
+        """
+        return float(self.histogram[:int(self._bins(np.array([threshold]))[0])].sum()) / self.count
+
+    def fraction_at_most(self, threshold: float) -> float:
+        """
+            Share of the pairs with a separation less than or equal to threshold NM, to the resolution of the bins.
+        """
+        return float(self.histogram[:int(self._bins(np.array([threshold]))[0]) + 1].sum()) / self.count
+
+    def summary(self) -> dict:
+        """
+            The statistics as a flat dict, including the usual quantiles.
+        """
+        summary = {'count': self.count, 'mean': self.mean, 'std': self.std, 'min': self.min, 'max': self.max}
+        for q in (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99):
+            summary['p{}'.format(round(q * 100))] = self.quantile(q)
+        return summary
+
+
+def simulate_separation_statistics(n_aircraft: int, hypothesis_type: str = "hyp_1", rng: np.random.Generator = None,
+                                   params: model_parameters = DEFAULT_PARAMETERS,
+                                   chunk_size: int = 1_000_000) -> separation_statistics:
+    """
+        Streams a landing sequence of any length through the vectorized engine into a separation_statistics
+        accumulator, so memory does not depend on the run length.
+        :param n_aircraft: number of aircraft in the sequence
+        :param hypothesis_type: "hyp_1" or "hyp_2"
+        :param rng: numpy random generator
+        :param params: model parameters
+        :param chunk_size: aircraft simulated per batch
+        :return: separation_statistics of all consecutive pairs
+        >>> simulate_separation_statistics(5000, "hyp_2", np.random.default_rng(5), chunk_size=1000).count
+        4999
+    """
+    stats = separation_statistics()
+    for sequence, separations in iterate_landing_sequence(n_aircraft, hypothesis_type, rng, params, chunk_size):
+        stats.update(separations)
+    return stats
+
+
+# factors recorded for both flights of a pair, in the column order of the hyp1/hyp2 exports
+PAIR_FACTORS = ('weather', 'wind', 'aircraft_weight_class', 'ground_traffic', 'air_traffic_congestion')
+PAIR_RECORD_COLUMNS = [factor + str(flight) for factor in PAIR_FACTORS for flight in (1, 2)] + ['calculated_minima']
+
+# category -> int8 code lookup for every factor
+CATEGORY_CODES = {factor: {category: code for code, category in enumerate(categories)}
+                  for factor, categories in FACTOR_TYPES.items()}
+
+
+class chunked_csv_exporter:
+
+    def __init__(self, path: str, chunk_rows: int = 100_000):
+        """
+            Writes pair records in the hyp1/hyp2 CSV layout (a leading row index, then PAIR_RECORD_COLUMNS).
+            Rows are decoded and written chunk_rows at a time, so export cost is linear in the number of rows and
+            memory use does not depend on it.
+            :param path: output CSV file
+            :param chunk_rows: maximum number of rows formatted at once
+        """
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.rows_written = 0
+        self.file = open(path, 'w', newline='')
+        self.file.write(',' + ','.join(PAIR_RECORD_COLUMNS) + '\n')
+        self._vocabularies = {factor: np.array(categories, dtype=object) for factor, categories in FACTOR_TYPES.items()}
+
+    def write(self, columns: dict):
+        """
+            Appends rows to the CSV file.
+            :param columns: dict of equal length arrays keyed by PAIR_RECORD_COLUMNS, category columns as int8 codes
+        """
+        n_rows = len(columns['calculated_minima'])
+        for start in range(0, n_rows, self.chunk_rows):
+            stop = min(start + self.chunk_rows, n_rows)
+            with INSTRUMENTATION.stage('export'):
+                fields = [map(str, range(self.rows_written, self.rows_written + stop - start))]
+                for column in PAIR_RECORD_COLUMNS[:-1]:
+                    fields.append(self._vocabularies[column[:-1]][columns[column][start:stop]])
+                fields.append(map(repr, columns['calculated_minima'][start:stop].tolist()))
+                text = '\n'.join(map(','.join, zip(*fields))) + '\n'
+                self.file.write(text)
+            self.rows_written += stop - start
+            # the layout is pure ASCII, so characters are bytes
+            INSTRUMENTATION.count('rows_exported', stop - start)
+            INSTRUMENTATION.count('bytes_written', len(text))
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class pair_record_buffer:
+
+    def __init__(self, chunk_rows: int = 65_536, exporter: chunked_csv_exporter = None):
+        """
+            Columnar buffer of (current, next) flight pairs. Category columns are stored as int8 codes and the
+            calculated separation minima as float64, in preallocated arrays that double in size when full, so
+            recording n rows copies O(n) rows in total.
+            When an exporter is given, every full chunk is written out and the buffer is reused, which keeps
+            memory flat for traces of any length.
+            :param chunk_rows: number of rows allocated (or flushed) at a time
+            :param exporter: optional chunked_csv_exporter receiving full chunks
+            >>> buffer = pair_record_buffer(chunk_rows=2)
+            >>> aircraft = generate_aircraft(4, "hyp_2", weather_decider(), wind_decider(), weight_decider(),
+            ...                              ground_traffic_decider())
+            >>> run_pair_pipeline(score_pairs(pair_stream(aircraft), "hyp_2"), buffer.append)
+            3
+            >>> len(buffer), buffer.capacity, buffer.columns()['weather2'].tolist()
+            (3, 4, [2, 2, 2])
+        """
+        self.chunk_rows = chunk_rows
+        self.exporter = exporter
+        self.size = 0
+        self.rows_flushed = 0
+        self._columns = {column: np.empty(chunk_rows, dtype=np.int8) for column in PAIR_RECORD_COLUMNS[:-1]}
+        self._columns['calculated_minima'] = np.empty(chunk_rows, dtype=np.float64)
+
+    @property
+    def capacity(self) -> int:
+        return len(self._columns['calculated_minima'])
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _reserve(self, n_rows: int):
+        """
+            Makes room for n_rows more rows, by flushing to the exporter or by growing geometrically, to at least
+            twice the capacity in whole chunks.
+            >>> buffer = pair_record_buffer(chunk_rows=16)
+            >>> sequence, separations = next(iterate_landing_sequence(101, rng=np.random.default_rng(2)))
+            >>> capacities = set()
+            >>> for i in range(10_000):
+            ...     buffer.extend(sequence, separations)
+            ...     capacities.add(buffer.capacity)
+            >>> len(buffer), len(capacities), buffer.capacity < 2 * len(buffer)
+            (1000000, 15, True)
+        """
+        if self.size + n_rows <= self.capacity:
+            return
+        if self.exporter is not None:
+            self.flush()
+            if n_rows <= self.capacity:
+                return
+        new_capacity = -(-max(self.size + n_rows, 2 * self.capacity) // self.chunk_rows) * self.chunk_rows
+        for column, values in self._columns.items():
+            grown = np.empty(new_capacity, dtype=values.dtype)
+            grown[:self.size] = values[:self.size]
+            self._columns[column] = grown
+
+    def append(self, aircraft_1: airplane_attributes, aircraft_2: airplane_attributes, calculated_minima: float):
+        """
+            Records one pair of flights given their attributes as category strings. The signature matches the
+            consumers of run_pair_pipeline, so buffer.append can be plugged in as a recording stage.
+            :param aircraft_1: current flight in queue
+            :param aircraft_2: next flight in queue
+            :param calculated_minima: separation minima calculated for the pair
+        """
+        self._reserve(1)
+        row = self.size
+        for factor in PAIR_FACTORS:
+            codes = CATEGORY_CODES[factor]
+            self._columns[factor + '1'][row] = codes[getattr(aircraft_1, factor)]
+            self._columns[factor + '2'][row] = codes[getattr(aircraft_2, factor)]
+        self._columns['calculated_minima'][row] = calculated_minima
+        self.size += 1
+
+    def extend(self, sequence: dict, separations: np.ndarray):
+        """
+            Records all consecutive pairs of a sampled landing sequence.
+            :param sequence: dict of code arrays, as yielded by iterate_landing_sequence
+            :param separations: separation minima of the consecutive pairs of the sequence
+            >>> buffer = pair_record_buffer(chunk_rows=4)
+            >>> for sequence, separations in iterate_landing_sequence(250, rng=np.random.default_rng(2), chunk_size=100):
+            ...     buffer.extend(sequence, separations)
+            >>> len(buffer), buffer.capacity
+            (249, 400)
+        """
+        with INSTRUMENTATION.stage('record'):
+            self._extend(sequence, separations)
+
+    def _extend(self, sequence: dict, separations: np.ndarray):
+        n_rows = len(separations)
+        offset = 0
+        while offset < n_rows:
+            # a buffer flushing to an exporter never grows, so rows are copied at most one chunk at a time
+            step = n_rows - offset if self.exporter is None else min(n_rows - offset, self.chunk_rows)
+            self._reserve(step)
+            rows = slice(self.size, self.size + step)
+            for factor in PAIR_FACTORS:
+                codes = sequence[factor]
+                self._columns[factor + '1'][rows] = codes[offset:offset + step]
+                self._columns[factor + '2'][rows] = codes[offset + 1:offset + step + 1]
+            self._columns['calculated_minima'][rows] = separations[offset:offset + step]
+            self.size += step
+            offset += step
+
+    def columns(self) -> dict:
+        """
+            Views of the rows held in the buffer, keyed by PAIR_RECORD_COLUMNS.
+        """
+        return {column: values[:self.size] for column, values in self._columns.items()}
+
+    def flush(self):
+        """
+            Writes the rows held in the buffer to the exporter and empties the buffer.
+        """
+        if self.exporter is not None and self.size:
+            self.exporter.write(self.columns())
+            self.rows_flushed += self.size
+            self.size = 0
+
+    def to_csv(self, path: str, chunk_rows: int = 100_000):
+        """
+            Exports the rows held in the buffer to a CSV file in the hyp1/hyp2 layout.
+            :param path: output CSV file
+            :param chunk_rows: maximum number of rows formatted at once
+        """
+        with chunked_csv_exporter(path, chunk_rows) as exporter:
+            exporter.write(self.columns())
+
+    def to_dataframe(self) -> 'pd.DataFrame':
+        """
+            The rows held in the buffer as a DataFrame with category strings, as the main loop used to build.
+        """
+        # pandas is imported only when a DataFrame is asked for, it dominates the import time of the module
+        import pandas as pd
+        data = {column: pd.Categorical.from_codes(codes, FACTOR_TYPES[column[:-1]])
+                for column, codes in self.columns().items() if column != 'calculated_minima'}
+        data['calculated_minima'] = self._columns['calculated_minima'][:self.size].copy()
+        return pd.DataFrame(data, columns=PAIR_RECORD_COLUMNS)
+
+
+def generate_aircraft(n_aircraft: int, hypothesis_type: str, weather_decider: 'weather_decider',
+                      wind_decider: 'wind_decider', weight_decider: 'weight_decider',
+                      ground_traffic_decider: 'ground_traffic_decider'):
+    """
+        Source stage of the streaming pipeline: yields the aircraft of a landing sequence one at a time, drawn from
+        the decider classes exactly as the main loop builds its airplane_attributes objects.
+        :param n_aircraft: number of aircraft in the sequence
+        :param hypothesis_type: "hyp_1" or "hyp_2"
+        :return: generator of airplane_attributes
+    """
+    instrumentation = INSTRUMENTATION
+    if not instrumentation.enabled:
+        for i in range(n_aircraft):
+            yield airplane_attributes(weather_decider, wind_decider, weight_decider, ground_traffic_decider,
+                                      hypothesis_type)
+        return
+    # instrumented copy of the loop, a stage around the deciders of every aircraft so that hooks see each pass
+    for i in range(n_aircraft):
+        with instrumentation.stage('sample'):
+            aircraft = airplane_attributes(weather_decider, wind_decider, weight_decider, ground_traffic_decider,
+                                           hypothesis_type)
+        instrumentation.count('aircraft_sampled')
+        yield aircraft
+
+
+def pair_stream(aircraft_stream):
+    """
+        Yields the consecutive (current, next) pairs of a stream of aircraft, keeping only the previous aircraft.
+        >>> list(pair_stream(iter('abc')))
+        [('a', 'b'), ('b', 'c')]
+    """
+    previous = None
+    for aircraft in aircraft_stream:
+        if previous is not None:
+            yield previous, aircraft
+        previous = aircraft
+
+
+def score_pairs(pairs, hypothesis_type: str = "hyp_1",
+                separation_minima: float = DEFAULT_PARAMETERS.separation_minima, rules: compiled_rules = None):
+    """
+        Scoring stage: yields (current, next, separation minima) for every pair, looking the separation up in the
+        compiled pairwise table by the states of both aircraft.
+        :param pairs: stream of (current, next) airplane_attributes
+        :param hypothesis_type: "hyp_1" or "hyp_2", selects the weather rule
+        :param separation_minima: default separation minima defined (5 NM)
+        :param rules: compiled separation rules, the shipped rules if not given
+    """
+    # nested lists index faster than a numpy array from Python code
+    table = (rules or SEPARATION_RULES).pair_table(hypothesis_type, separation_minima).tolist()
+    instrumentation = INSTRUMENTATION
+    if not instrumentation.enabled:
+        for aircraft_1, aircraft_2 in pairs:
+            yield aircraft_1, aircraft_2, table[aircraft_1.state][aircraft_2.state]
+        return
+    for aircraft_1, aircraft_2 in pairs:
+        with instrumentation.stage('score'):
+            separation = table[aircraft_1.state][aircraft_2.state]
+        instrumentation.count('pairs_scored')
+        yield aircraft_1, aircraft_2, separation
+
+
+def statistics_stage(stats: separation_statistics):
+    """
+        Consumer adding the separation of every pair to a separation_statistics accumulator.
+    """
+    def consume(aircraft_1, aircraft_2, separation):
+        stats.update(separation)
+    return consume
+
+
+def run_pair_pipeline(scored_pairs, *consumers) -> int:
+    """
+        Drives a streaming pipeline: every scored pair is handed to each consumer, a callable taking
+        (current aircraft, next aircraft, separation minima), e.g. pair_record_buffer.append or statistics_stage.
+        Nothing but the pair in flight is retained, so memory does not depend on the length of the run.
+        :param scored_pairs: stream of (current, next, separation minima), as yielded by score_pairs
+        :param consumers: recording, statistics or export stages
+        :return: number of pairs processed
+        >>> with instrumented_run() as instrumentation:
+        ...     aircraft = generate_aircraft(5, "hyp_2", weather_decider(), wind_decider(), weight_decider(),
+        ...                                  ground_traffic_decider())
+        ...     run_pair_pipeline(score_pairs(pair_stream(aircraft), "hyp_2"), statistics_stage(separation_statistics()))
+        4
+        >>> sorted(instrumentation.stages), instrumentation.counters
+        (['consume', 'pipeline', 'sample', 'score'], {'aircraft_sampled': 5, 'pairs_scored': 4})
+        >>> events = []
+        >>> with instrumented_run([lambda event, stage, timing: events.append((event, stage))]):
+        ...     aircraft = generate_aircraft(3, "hyp_1", weather_decider(), wind_decider(), weight_decider(),
+        ...                                  ground_traffic_decider())
+        ...     run_pair_pipeline(score_pairs(pair_stream(aircraft), "hyp_1"), statistics_stage(separation_statistics()))
+        2
+        >>> [events.count(('stop', stage)) for stage in ('sample', 'score', 'consume', 'pipeline')]
+        [3, 2, 2, 1]
+    """
+    n_pairs = 0
+    instrumentation = INSTRUMENTATION
+    with instrumentation.stage('pipeline'):
+        if not instrumentation.enabled:
+            for aircraft_1, aircraft_2, separation in scored_pairs:
+                for consume in consumers:
+                    consume(aircraft_1, aircraft_2, separation)
+                n_pairs += 1
+            return n_pairs
+        # instrumented copy of the loop, timing the consumers of every pair
+        for aircraft_1, aircraft_2, separation in scored_pairs:
+            with instrumentation.stage('consume'):
+                for consume in consumers:
+                    consume(aircraft_1, aircraft_2, separation)
+            n_pairs += 1
+    return n_pairs
+
+
+def _t_quantile(p: float, df: int) -> float:
+    """
+        Quantile of Student's t distribution, by Hill's algorithm (Comm. ACM 13(10), 1970, algorithm 396): exact for
+        1 and 2 degrees of freedom, accurate to about 1e-5 relative from 3 degrees of freedom on.
+        :param p: probability
+        :param df: degrees of freedom
+        :return: t such that P(T <= t) = p
+        >>> round(_t_quantile(0.975, 9), 3), round(_t_quantile(0.975, 1), 3)
+        (2.262, 12.706)
+        >>> round(_t_quantile(0.975, 3), 4), round(_t_quantile(0.995, 3), 4), round(_t_quantile(0.025, 7), 4)
+        (3.1824, 5.8409, -2.3646)
+    """
+    if p == 0.5:
+        return 0.0
+    # Hill's algorithm works on the two-tailed probability
+    two_tailed = 2 * min(p, 1 - p)
+    sign = 1 if p > 0.5 else -1
+    if df == 1:
+        return sign * math.cos(two_tailed * math.pi / 2) / math.sin(two_tailed * math.pi / 2)
+    if df == 2:
+        return sign * math.sqrt(2 / (two_tailed * (2 - two_tailed)) - 2)
+    a = 1 / (df - 0.5)
+    b = 48 / (a * a)
+    c = ((20700 * a / b - 98) * a - 16) * a + 96.36
+    d = ((94.5 / (b + c) - 3) / b + 1) * math.sqrt(a * math.pi / 2) * df
+    y = (d * two_tailed) ** (2 / df)
+    if y > 0.05 + a:
+        # asymptotic inverse expansion about the normal distribution
+        x = statistics.NormalDist().inv_cdf(0.5 * two_tailed)
+        y = x * x
+        if df < 5:
+            c += 0.3 * (df - 4.5) * (x + 0.6)
+        c = (((0.05 * d * x - 5) * x - 7) * x - 2) * x + b + c
+        y = (((((0.4 * y + 6.3) * y + 36) * y + 94.5) / c - y - 3) / b + 1) * x
+        y = math.expm1(a * y * y)
     else:
-        return separation - 0.3
+        # far tail of few degrees of freedom
+        y = ((1 / (((df + 6) / (df * y) - 0.089 * d - 0.822) * (df + 2) * 3) + 0.5 / (df + 4)) * y - 1) \
+            * (df + 1) / (df + 2) + 1 / y
+    return sign * math.sqrt(df * y)
+
+
+@dataclass(frozen=True)
+class replication_summary:
+    """
+        Result of independent replications of a hypothesis: the average separation minima of every replication,
+        their mean, its standard error and a Student t confidence interval, plus the streaming statistics of all
+        pairs of all replications merged together.
+    """
+    hypothesis_type: str
+    n_aircraft: int
+    replication_means: tuple
+    mean: float
+    std_error: float
+    ci_low: float
+    ci_high: float
+    confidence: float
+    pair_statistics: separation_statistics = field(default=None, compare=False, repr=False)
+
+
+def summarize_replications(hypothesis_type: str, n_aircraft: int, replication_means: list,
+                           confidence: float = 0.95, pair_statistics: separation_statistics = None) -> replication_summary:
+    """
+        Merges per-replication averages into a mean, a standard error and a confidence interval.
+        :param hypothesis_type: "hyp_1" or "hyp_2"
+        :param n_aircraft: aircraft per replication
+        :param replication_means: average separation minima of every replication
+        :param confidence: confidence level of the interval
+        :param pair_statistics: optional merged separation_statistics of all replications
+        :return: replication_summary
+        >>> summary = summarize_replications("hyp_1", 1000, [4.6, 4.8, 4.7, 4.7])
+        >>> round(summary.mean, 3), round(summary.std_error, 4), round(summary.ci_low, 3), round(summary.ci_high, 3)
+        (4.7, 0.0408, 4.57, 4.83)
+    """
+    mean = statistics.fmean(replication_means)
+    if len(replication_means) > 1:
+        std_error = statistics.stdev(replication_means) / math.sqrt(len(replication_means))
+        half_width = _t_quantile(0.5 + confidence / 2, len(replication_means) - 1) * std_error
+    else:
+        std_error = half_width = math.nan
+    return replication_summary(hypothesis_type, n_aircraft, tuple(replication_means), mean, std_error,
+                               mean - half_width, mean + half_width, confidence, pair_statistics)
+
+
+def _run_replication(task: tuple) -> separation_statistics:
+    """
+        Worker of run_replications: one landing sequence on its own random stream.
+    """
+    hypothesis_type, n_aircraft, seed_sequence, params, chunk_size = task
+    return simulate_separation_statistics(n_aircraft, hypothesis_type, np.random.default_rng(seed_sequence), params,
+                                          chunk_size)
+
+
+def run_replications(hypothesis_type: str = "hyp_1", n_replications: int = 10, n_aircraft: int = 1000,
+                     seed: int = None, workers: int = None, params: model_parameters = DEFAULT_PARAMETERS,
+                     chunk_size: int = 1_000_000, confidence: float = 0.95) -> replication_summary:
+    """
+        Runs independent replications of a hypothesis across a process pool. Every replication draws from its own
+        child of np.random.SeedSequence(seed), so the streams do not overlap and a given seed gives bit-identical
+        results whatever the number of workers.
+        :param hypothesis_type: "hyp_1" or "hyp_2"
+        :param n_replications: number of independent landing sequences
+        :param n_aircraft: aircraft per landing sequence
+        :param seed: root seed, fresh entropy if not given
+        :param workers: number of worker processes, all cores if not given, 1 runs in this process
+        :param params: model parameters
+        :param chunk_size: aircraft simulated per batch within a replication
+        :param confidence: confidence level of the interval
+        :return: replication_summary
+        >>> run_replications("hyp_2", 4, 2000, seed=11, workers=1) == run_replications("hyp_2", 4, 2000, seed=11, workers=2)
+        True
+    """
+    seed_sequences = np.random.SeedSequence(seed).spawn(n_replications)
+    tasks = [(hypothesis_type, n_aircraft, seed_sequence, params, chunk_size) for seed_sequence in seed_sequences]
+    if workers == 1:
+        replications = list(map(_run_replication, tasks))
+    else:
+        # imported on demand: concurrent.futures is slow to import and single process runs do not need it
+        from concurrent.futures import ProcessPoolExecutor
+        workers = workers or os.cpu_count()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            replications = list(executor.map(_run_replication, tasks, chunksize=max(1, n_replications // (4 * workers))))
+    merged = separation_statistics()
+    for stats in replications:
+        merged.merge(stats)
+    return summarize_replications(hypothesis_type, n_aircraft, [stats.mean for stats in replications], confidence,
+                                  merged)
+
+
+@dataclass(frozen=True)
+class exact_separation:
+    """
+        Exact distribution of the separation minima (in NM) of a consecutive pair, drawn uniformly from the pairs
+        of a landing sequence: the distinct separation values, their probabilities, the mean and the variance.
+    """
+    hypothesis_type: str
+    values: tuple
+    probabilities: tuple
+    mean: float
+    variance: float
+
+    def probability_below(self, threshold: float) -> float:
+        """
+            Probability that the separation of a pair is strictly less than threshold NM.
+        """
+        return math.fsum(p for value, p in zip(self.values, self.probabilities) if value < threshold - 1e-9)
+
+
+def _pair_type_weights(params: model_parameters, n_aircraft: int = None) -> dict:
+    """
+        Share of the consecutive pairs of a landing sequence in which each sampled factor is redrawn between the
+        two flights, i.e. the next flight starts a new block of that factor. Aircraft j (counting from 0) starts
+        a block when j is a multiple of the period.
+        :param params: model parameters
+        :param n_aircraft: length of the landing sequence, the long run limit if not given
+        :return: dict mapping a tuple of redrawn flags (in SAMPLED_FACTORS order) to its share of the pairs
+        >>> weights = _pair_type_weights(DEFAULT_PARAMETERS)
+        >>> weights[(False, False, True, False)], weights[(False, True, True, True)], weights[(True, True, True, True)]
+        (0.9, 0.04, 0.01)
+    """
+    periods = [getattr(params, factor + '_period') for factor in SAMPLED_FACTORS]
+    cycle = math.lcm(*periods)
+    if n_aircraft is None:
+        full_cycles, remainder, total = 1, 0, cycle
+    else:
+        (full_cycles, remainder), total = divmod(n_aircraft - 1, cycle), n_aircraft - 1
+    counts = {}
+    for j in range(1, cycle + 1):
+        pair_type = tuple(j % period == 0 for period in periods)
+        counts[pair_type] = counts.get(pair_type, 0) + full_cycles + (j <= remainder)
+    return {pair_type: count / total for pair_type, count in counts.items() if count}
+
+
+def _along_axis(values: np.ndarray, axis: int, ndim: int = 4) -> np.ndarray:
+    """
+        Reshapes a 1D array to lie along one axis of an ndim array, for broadcasting.
+        >>> _along_axis(np.arange(3), 1).shape
+        (1, 3, 1, 1)
+    """
+    shape = [1] * ndim
+    shape[axis] = -1
+    return values.reshape(shape)
+
+
+def solve_exact_separation(hypothesis_type: str = "hyp_1", params: model_parameters = DEFAULT_PARAMETERS,
+                           n_aircraft: int = None) -> exact_separation:
+    """
+        Computes the exact distribution of the separation minima without sampling. Within a block a factor keeps
+        its category, so the pair is (a, a) with probability p(a); across a block boundary the two categories are
+        independent draws, (a, b) with probability p(a) * p(b). The factors are independent of each other and the
+        separation is built from the same delta tables and in the same order as the sampling engines, so every
+        separation value matches a simulated one exactly. The result is a mixture over the kinds of pairs
+        (which factors are redrawn) weighted by their share of the sequence.
+        :param hypothesis_type: "hyp_1" or "hyp_2"
+        :param params: model parameters
+        :param n_aircraft: length of the landing sequence, the long run limit if not given
+        :return: exact_separation
+        >>> solution = solve_exact_separation("hyp_1")
+        >>> round(solution.mean, 6), round(solve_exact_separation("hyp_2").mean, 6)
+        (4.698, 5.698)
+        >>> round(math.fsum(solution.probabilities), 12), min(solution.values), max(solution.values)
+        (1.0, 0.2, 10.8)
+    """
+    probabilities = {factor: np.asarray(getattr(params, factor + '_weights'), dtype=np.float64)
+                     for factor in SAMPLED_FACTORS}
+    probabilities = {factor: p / p.sum() for factor, p in probabilities.items()}
+    tables = get_separation_rules(params.rules_file).tables
+    congestion = GROUND_TRAFFIC_TO_CONGESTION
+    weather_cat_3 = WEATHER_TYPES.index('cat_3')
+
+    values = []
+    weights = []
+    for pair_type, share in _pair_type_weights(params, n_aircraft).items():
+        # per factor: the (previous, next) code pairs that can occur in this kind of pair, with their probability
+        factor_pairs = []
+        for factor, redrawn in zip(SAMPLED_FACTORS, pair_type):
+            p = probabilities[factor]
+            if factor == 'weather' and hypothesis_type == "hyp_2":
+                codes_1 = codes_2 = np.array([weather_cat_3])
+                pair_p = np.ones(1)
+            elif redrawn:
+                codes_1, codes_2 = (codes.ravel() for codes in np.indices((len(p), len(p))))
+                pair_p = np.outer(p, p).ravel()
+            else:
+                codes_1 = codes_2 = np.arange(len(p))
+                pair_p = p
+            factor_pairs.append((codes_1, codes_2, pair_p))
+        # one axis per sampled factor; ground traffic and air traffic congestion share an axis
+        (w1, w2, w_p), (v1, v2, v_p), (a1, a2, a_p), (g1, g2, g_p) = factor_pairs
+        separation = np.full((1, 1, 1, 1), params.separation_minima, dtype=np.float64)
+        separation = separation + _along_axis(tables[hypothesis_type][w1, w2], 0)
+        separation = separation + _along_axis(tables['wind'][v1, v2], 1)
+        separation = separation + _along_axis(tables['aircraft_weight_class'][a1, a2], 2)
+        separation = separation + _along_axis(tables['ground_traffic'][g1, g2], 3)
+        separation = separation + _along_axis(tables['air_traffic_congestion'][congestion[g1], congestion[g2]],
+                                              3)
+        probability = _along_axis(w_p, 0) * _along_axis(v_p, 1) * _along_axis(a_p, 2) * _along_axis(g_p, 3)
+        values.append(separation.ravel())
+        weights.append(share * probability.ravel())
+
+    values = np.concatenate(values)
+    weights = np.concatenate(weights)
+    # chained float additions can give the same separation with different rounding, e.g. 5.6 and 5.6000000000000005
+    distinct, inverse = np.unique(np.round(values, 9), return_inverse=True)
+    pmf = np.bincount(inverse, weights=weights)
+    keep = pmf > 0
+    mean = math.fsum(values * weights)
+    variance = math.fsum((values - mean) ** 2 * weights)
+    return exact_separation(hypothesis_type, tuple(distinct[keep].tolist()), tuple(pmf[keep].tolist()), mean, variance)
+
+
+SWEEP_STATISTICS = ('count', 'mean', 'std', 'min', 'p5', 'p50', 'p95', 'max', 'fraction_below_3')
+
+
+class _common_random_streams:
+
+    def __init__(self, uniforms: dict, start: int, carried: dict):
+        """
+            Category codes and aircraft states derived from one chunk of common uniform draws, cached so that grid
+            points sharing a factor setting (weights and period) or a full sampling setting reuse the same arrays
+            instead of sampling again. Blocks follow the global aircraft index, a block of `period` aircraft
+            starting at a multiple of the period, so chunks need not be aligned to the periods: aircraft at the
+            start of a chunk that continue a block of the previous chunk take its last code.
+            :param uniforms: one uniform [0, 1) draw per aircraft and sampled factor
+            :param start: index of the first aircraft of the chunk in the landing sequence
+            :param carried: last code of every factor setting in the previous chunk
+        """
+        self.uniforms = uniforms
+        self.start = start
+        self.carried = carried
+        self.last_codes = {}
+        self._codes = {}
+        self._states = {}
+
+    def codes(self, factor: str, weights: tuple, period: int) -> np.ndarray:
+        key = (factor, tuple(weights), period)
+        if key not in self._codes:
+            uniforms = self.uniforms[factor]
+            # the first aircraft of every block starting in this chunk holds its draw
+            codes = _continue_blocks(uniforms[-self.start % period::period], weights, period, len(uniforms),
+                                     self.start, self.carried.get(key, 0))
+            self._codes[key] = codes
+            self.last_codes[key] = codes[-1]
+        return self._codes[key]
+
+    def states(self, hypothesis_type: str, params: model_parameters) -> np.ndarray:
+        key = (hypothesis_type,) + tuple(
+            (tuple(getattr(params, factor + '_weights')), getattr(params, factor + '_period'))
+            for factor in SAMPLED_FACTORS if not (factor == 'weather' and hypothesis_type == "hyp_2"))
+        if key not in self._states:
+            sequence = {factor: self.codes(factor, getattr(params, factor + '_weights'),
+                                           getattr(params, factor + '_period'))
+                        for factor in SAMPLED_FACTORS if not (factor == 'weather' and hypothesis_type == "hyp_2")}
+            if hypothesis_type == "hyp_2":
+                sequence['weather'] = np.full(len(self.uniforms['weather']), WEATHER_TYPES.index('cat_3'), dtype=np.int8)
+            self._states[key] = encode_states(sequence)
+        return self._states[key]
+
+
+def sweep_grid(grid: dict, base: model_parameters = DEFAULT_PARAMETERS) -> list:
+    """
+        Expands a grid of model parameter values into the model_parameters of every grid point.
+        :param grid: dict mapping model_parameters field names to the list of values to evaluate
+        :param base: parameters of the fields not in the grid
+        :return: list of (point, model_parameters) tuples, point being the dict of grid values
+        >>> [point for point, params in sweep_grid({'separation_minima': [4, 5], 'wind_period': [10, 20]})]
+        [{'separation_minima': 4, 'wind_period': 10}, {'separation_minima': 4, 'wind_period': 20}, {'separation_minima': 5, 'wind_period': 10}, {'separation_minima': 5, 'wind_period': 20}]
+    """
+    unknown = set(grid) - {parameter.name for parameter in fields(model_parameters)}
+    if unknown:
+        raise ValueError("unknown model parameters: {}".format(', '.join(sorted(unknown))))
+    points = [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+    return [(point, replace(base, **point)) for point in points]
+
+
+def run_parameter_sweep(grid: dict, n_aircraft: int = 100_000, hypothesis_types: tuple = ("hyp_1",), seed: int = None,
+                        base: model_parameters = DEFAULT_PARAMETERS, chunk_size: int = 1_000_000) -> list:
+    """
+        Evaluates every point of a parameter grid on common random numbers. All grid points are driven by the same
+        uniform draw per aircraft and factor; a block of `period` aircraft takes the category of the draw of its
+        first aircraft through the inverse CDF of the point's weights. Differences between nearby points therefore
+        reflect the parameters rather than sampling noise, and sampled code streams, aircraft states and scored
+        separations are computed once per chunk for all points sharing them.
+        :param grid: dict mapping model_parameters field names to the list of values to evaluate
+        :param n_aircraft: number of aircraft in the landing sequence of every grid point
+        :param hypothesis_types: hypotheses evaluated at every grid point
+        :param seed: seed of the common random numbers
+        :param base: parameters of the fields not in the grid
+        :param chunk_size: aircraft simulated per batch; results do not depend on it
+        :return: tidy results, one dict per grid point and hypothesis with the grid values and SWEEP_STATISTICS
+        >>> rows = run_parameter_sweep({'separation_minima': [4, 5]}, 20_000, ("hyp_1", "hyp_2"), seed=1)
+        >>> [(row['hypothesis_type'], row['separation_minima']) for row in rows]
+        [('hyp_1', 4), ('hyp_1', 5), ('hyp_2', 4), ('hyp_2', 5)]
+        >>> round(rows[1]['mean'] - rows[0]['mean'], 9), round(rows[3]['mean'] - rows[2]['mean'], 9)
+        (1.0, 1.0)
+        >>> grid = {'wind_period': [7, 11], 'ground_traffic_period': [13]}
+        >>> chunked, whole = run_parameter_sweep(grid, 5000, seed=2, chunk_size=999), run_parameter_sweep(grid, 5000, seed=2)
+        >>> def key(rows):
+        ...     return [(row['count'], round(row['mean'], 9), row['p5'], row['max']) for row in rows]
+        >>> key(chunked) == key(whole)
+        True
+        >>> with instrumented_run() as instrumentation:
+        ...     rows = run_parameter_sweep(grid, 5000, seed=2, chunk_size=999)
+        >>> instrumentation.counters['pairs_scored']
+        9998
+    """
+    points = sweep_grid(grid, base)
+    rng = np.random.default_rng(seed)
+    evaluations = [(hypothesis_type, point, params) for hypothesis_type in hypothesis_types for point, params in points]
+    accumulators = [separation_statistics() for evaluation in evaluations]
+    last_states = [None] * len(evaluations)
+    carried = {}
+    for start in range(0, n_aircraft, chunk_size):
+        length = min(chunk_size, n_aircraft - start)
+        # one draw per aircraft regardless of the chunking, so the draws of an aircraft do not depend on chunk_size
+        uniforms = rng.random((length, len(SAMPLED_FACTORS))).T
+        streams = _common_random_streams(dict(zip(SAMPLED_FACTORS, uniforms)), start, carried)
+        for i, (hypothesis_type, point, params) in enumerate(evaluations):
+            # scored separations are not cached: they differ between grid points and would each take a chunk
+            states = streams.states(hypothesis_type, params)
+            table = get_separation_rules(params.rules_file).pair_table(hypothesis_type, params.separation_minima)
+            with INSTRUMENTATION.stage('score'):
+                if last_states[i] is not None:
+                    states = np.concatenate(([last_states[i]], states))
+                separations = table[states[:-1], states[1:]]
+            INSTRUMENTATION.count('pairs_scored', len(separations))
+            accumulators[i].update(separations)
+            last_states[i] = int(states[-1])
+        carried = streams.last_codes
+    rows = []
+    for (hypothesis_type, point, params), stats in zip(evaluations, accumulators):
+        row = {'hypothesis_type': hypothesis_type, **point}
+        summary = stats.summary()
+        summary['fraction_below_3'] = stats.fraction_below(3)
+        row.update({name: summary[name] for name in SWEEP_STATISTICS})
+        rows.append(row)
+    return rows
+
+
+def write_sweep_csv(rows: list, path: str):
+    """
+        Writes the tidy results of run_parameter_sweep to a CSV file, one row per grid point and hypothesis.
+    """
+    with open(path, 'w', newline='') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+@dataclass(frozen=True)
+class landing_scenario:
+    """
+        A way of scoring a landing sequence:
+            name: label of the scenario in the results
+            weather: weather category pinned for all flights, the sampled weather if None
+            weather_rule: rule table scoring weather transitions ("hyp_1" for the standard deltas, "hyp_2" for the
+                          prolonged worst weather rule)
+        >>> landing_scenario('fog', weather_rule="hyp_2")
+        Traceback (most recent call last):
+        ...
+        ValueError: weather_rule hyp_2 only defines unchanged weather, pin the weather of scenario fog
+    """
+    name: str
+    weather: str = None
+    weather_rule: str = "hyp_1"
+
+    def __post_init__(self):
+        if self.weather is not None and self.weather not in WEATHER_TYPES:
+            raise ValueError("weather must be one of {}".format(', '.join(WEATHER_TYPES)))
+        if self.weather_rule not in ("hyp_1", "hyp_2"):
+            raise ValueError("weather_rule must be hyp_1 or hyp_2")
+        if self.weather_rule == "hyp_2" and self.weather is None:
+            raise ValueError("weather_rule hyp_2 only defines unchanged weather, pin the weather of scenario {}"
+                             .format(self.name))
+
+
+# the two hypotheses of the study as scenarios; hypothesis 2 pins the weather to category 3
+HYPOTHESIS_SCENARIOS = {
+    'hyp_1': landing_scenario('hyp_1'),
+    'hyp_2': landing_scenario('hyp_2', weather='cat_3', weather_rule="hyp_2"),
+}
+
+
+@dataclass(frozen=True)
+class scenario_results:
+    """
+        Results of evaluate_scenarios: separation_statistics per scenario name, and for every scenario but the
+        baseline the statistics of the paired difference (scenario - baseline) of each pair of flights.
+    """
+    baseline: str
+    statistics: dict
+    differences: dict
+
+
+def evaluate_scenarios(scenarios: list, n_aircraft: int = 1000, rng: np.random.Generator = None,
+                       params: model_parameters = DEFAULT_PARAMETERS, chunk_size: int = 1_000_000) -> scenario_results:
+    """
+        Scores any number of scenarios against one shared sampled stream of weather, wind, weight class and ground
+        traffic in a single pass. Sampling is done once whatever the number of scenarios, and since every scenario
+        sees the same flights the differences between scenarios are paired comparisons, free of the sampling noise
+        of independent runs. The first scenario is the baseline of the differences.
+        :param scenarios: landing_scenario objects, or names of HYPOTHESIS_SCENARIOS
+        :param n_aircraft: number of aircraft in the shared landing sequence
+        :param rng: numpy random generator
+        :param params: model parameters
+        :param chunk_size: aircraft simulated per batch
+        :return: scenario_results
+        >>> results = evaluate_scenarios(['hyp_1', 'hyp_2', landing_scenario('fog', weather='cat_2')], 10_000,
+        ...                              np.random.default_rng(4))
+        >>> sorted(results.statistics), sorted(results.differences)
+        (['fog', 'hyp_1', 'hyp_2'], ['fog', 'hyp_2'])
+        >>> difference = results.differences['hyp_2']
+        >>> round(difference.mean, 9) == round(results.statistics['hyp_2'].mean - results.statistics['hyp_1'].mean, 9)
+        True
+        >>> round(difference.fraction_at_most(2), 4)
+        0.9991
+        >>> with instrumented_run() as instrumentation:
+        ...     results = evaluate_scenarios(['hyp_1', 'hyp_2'], 1000, np.random.default_rng(4), chunk_size=300)
+        >>> instrumentation.stages['score'][0], instrumentation.counters['pairs_scored']
+        (4, 1998)
+    """
+    scenarios = [HYPOTHESIS_SCENARIOS[scenario] if isinstance(scenario, str) else scenario for scenario in scenarios]
+    if rng is None:
+        rng = np.random.default_rng()
+    rules = get_separation_rules(params.rules_file)
+    tables = [rules.pair_table(scenario.weather_rule, params.separation_minima) for scenario in scenarios]
+    # weather is the most significant digit of an aircraft state
+    weather_stride = N_STATES // STATE_SHAPE[0]
+    pinned = [None if scenario.weather is None else CATEGORY_CODES['weather'][scenario.weather] * weather_stride
+              for scenario in scenarios]
+    scenario_statistics = [separation_statistics() for scenario in scenarios]
+    differences = [separation_statistics(low=-15.0, high=15.0) for scenario in scenarios[1:]]
+    previous_states = [None] * len(scenarios)
+    previous = None
+    for start in range(0, n_aircraft, chunk_size):
+        sequence = sample_landing_sequence(min(chunk_size, n_aircraft - start), "hyp_1", rng, params, start, previous)
+        previous = sequence
+        sampled_states = encode_states(sequence)
+        other_states = sampled_states % weather_stride
+        separations = []
+        with INSTRUMENTATION.stage('score'):
+            for i, table in enumerate(tables):
+                states = sampled_states if pinned[i] is None else other_states + pinned[i]
+                if previous_states[i] is not None:
+                    states = np.concatenate(([previous_states[i]], states))
+                separations.append(table[states[:-1], states[1:]])
+                previous_states[i] = states[-1]
+        INSTRUMENTATION.count('pairs_scored', sum(len(scenario_separations) for scenario_separations in separations))
+        for stats, scenario_separations in zip(scenario_statistics, separations):
+            stats.update(scenario_separations)
+        for i, difference in enumerate(differences, start=1):
+            difference.update(separations[i] - separations[0])
+    return scenario_results(scenarios[0].name,
+                            {scenario.name: stats for scenario, stats in zip(scenarios, scenario_statistics)},
+                            {scenario.name: stats for scenario, stats in zip(scenarios[1:], differences)})
+
+
+VARIANCE_REDUCTION_METHODS = ('none', 'antithetic', 'stratified', 'importance')
+
+# factors sampled from a proposal distribution under importance sampling; they carry the rare combinations
+IMPORTANCE_FACTORS = ('wind', 'aircraft_weight_class')
+
+
+@dataclass(frozen=True)
+class convergence_result:
+    """
+        Result of run_until_converged: the estimate (mean separation minima in NM, or the probability of a
+        separation below threshold), its standard error and confidence interval half-width over independent
+        batches, the number of batches and simulated aircraft, and whether the tolerance was reached.
+    """
+    hypothesis_type: str
+    method: str
+    threshold: float
+    estimate: float
+    std_error: float
+    half_width: float
+    confidence: float
+    n_batches: int
+    n_aircraft: int
+    converged: bool
+
+
+def _stratified_uniforms(n: int, rng: np.random.Generator) -> np.ndarray:
+    """
+        n uniform draws, one in each of the n equal strata of [0, 1) in random order (Latin hypercube sampling),
+        so that every category occurs in its expected proportion of the blocks up to rounding.
+        >>> np.sort(np.floor(_stratified_uniforms(4, np.random.default_rng(0)) * 4)).tolist()
+        [0.0, 1.0, 2.0, 3.0]
+    """
+    return (rng.permutation(n) + rng.random(n)) / n
+
+
+def _default_proposal(params: model_parameters) -> dict:
+    """
+        Defensive importance sampling proposal: an even mixture of the model weights and the uniform distribution,
+        so that rare categories (wind shear, super, light) are drawn far more often while the likelihood ratio stays
+        bounded by 2 per draw.
+        >>> [round(q, 4) for q in _default_proposal(DEFAULT_PARAMETERS)['aircraft_weight_class']]
+        [0.15, 0.425, 0.275, 0.15]
+    """
+    proposal = {}
+    for factor in IMPORTANCE_FACTORS:
+        p = np.asarray(getattr(params, factor + '_weights'), dtype=np.float64)
+        proposal[factor] = tuple((0.5 * p / p.sum() + 0.5 / len(p)).tolist())
+    return proposal
+
+
+def _pair_likelihood_ratios(sequence: dict, params: model_parameters, proposal: dict) -> np.ndarray:
+    """
+        Likelihood ratio p / q of the draws each consecutive pair depends on, for factors sampled from the proposal
+        q instead of the model weights p. Within a block both flights share one draw, across a block boundary
+        the pair depends on the draws of both blocks.
+    """
+    ratios = np.ones(len(sequence['wind']) - 1, dtype=np.float64)
+    for factor, q in proposal.items():
+        p = np.asarray(getattr(params, factor + '_weights'), dtype=np.float64)
+        ratio = (p / p.sum()) / np.asarray(q, dtype=np.float64)
+        aircraft_ratio = ratio[sequence[factor]]
+        period = getattr(params, factor + '_period')
+        redrawn = np.arange(1, len(aircraft_ratio)) % period == 0
+        ratios *= aircraft_ratio[1:] * np.where(redrawn, aircraft_ratio[:-1], 1.0)
+    return ratios
+
+
+def _batch_estimate(hypothesis_type: str, n_aircraft: int, method: str, threshold: float, rng: np.random.Generator,
+                    params: model_parameters, rules: compiled_rules, proposal: dict) -> tuple:
+    """
+        Estimate of one independent batch under a variance reduction method, and the aircraft it simulated.
+    """
+    factors = [factor for factor in SAMPLED_FACTORS if not (factor == 'weather' and hypothesis_type == "hyp_2")]
+    n_blocks = {factor: -(-n_aircraft // getattr(params, factor + '_period')) for factor in factors}
+    if method == 'stratified':
+        uniforms = [{factor: _stratified_uniforms(n_blocks[factor], rng) for factor in factors}]
+    else:
+        uniforms = [{factor: rng.random(n_blocks[factor]) for factor in factors}]
+        if method == 'antithetic':
+            uniforms.append({factor: 1.0 - draws for factor, draws in uniforms[0].items()})
+    estimates = []
+    for block_uniforms in uniforms:
+        weights = proposal if method == 'importance' else None
+        sequence = landing_sequence_from_uniforms(block_uniforms, n_aircraft, hypothesis_type, params, weights)
+        separations = score_landing_sequence(sequence, hypothesis_type, params.separation_minima, rules)
+        values = separations if threshold is None else (separations < threshold - 1e-9).astype(np.float64)
+        if method == 'importance':
+            # self-normalized: the ratio estimator has far less variance than the plain weighted mean
+            ratios = _pair_likelihood_ratios(sequence, params, proposal)
+            estimates.append(float(np.dot(values, ratios) / ratios.sum()))
+        else:
+            estimates.append(float(values.mean()))
+    return statistics.fmean(estimates), n_aircraft * len(uniforms)
+
+
+def run_until_converged(hypothesis_type: str = "hyp_1", tolerance: float = 0.01, method: str = 'none',
+                        threshold: float = None, batch_size: int = 10_000, min_batches: int = 10,
+                        max_aircraft: int = 10 ** 8, confidence: float = 0.95, rng: np.random.Generator = None,
+                        params: model_parameters = DEFAULT_PARAMETERS, proposal: dict = None) -> convergence_result:
+    """
+        Simulates independent batches of aircraft until the confidence interval half-width of the estimate is at
+        most tolerance, instead of a fixed run length. Variance reduction methods for the categorical draws:
+            none: plain Monte Carlo
+            antithetic: every batch is paired with its antithetic batch, drawn from 1 - u
+            stratified: the block draws of every factor are stratified over [0, 1), so each batch holds the weather
+                        regimes (and wind, weight class and ground traffic categories) in their expected proportions
+            importance: wind and weight class are drawn from a proposal that oversamples their rare categories, and
+                        every pair is reweighted by its likelihood ratio (self-normalized within the batch)
+        :param hypothesis_type: "hyp_1" or "hyp_2"
+        :param tolerance: target half-width of the confidence interval
+        :param method: one of VARIANCE_REDUCTION_METHODS
+        :param threshold: estimate the probability of a separation below threshold NM instead of the mean
+        :param batch_size: aircraft per batch
+        :param min_batches: batches simulated before convergence is checked
+        :param max_aircraft: budget of simulated aircraft
+        :param confidence: confidence level of the interval
+        :param rng: numpy random generator
+        :param params: model parameters
+        :param proposal: importance sampling weights per factor of IMPORTANCE_FACTORS, see _default_proposal
+        :return: convergence_result
+        >>> result = run_until_converged("hyp_1", 0.005, 'stratified', rng=np.random.default_rng(8))
+        >>> result.converged, abs(result.estimate - solve_exact_separation("hyp_1").mean) < 3 * result.std_error
+        (True, True)
+        >>> result = run_until_converged("hyp_1", 0.002, 'importance', threshold=3, rng=np.random.default_rng(8))
+        >>> result.converged, abs(result.estimate - solve_exact_separation("hyp_1").probability_below(3)) < 0.002
+        (True, True)
+    """
+    if method not in VARIANCE_REDUCTION_METHODS:
+        raise ValueError("method must be one of {}".format(', '.join(VARIANCE_REDUCTION_METHODS)))
+    if rng is None:
+        rng = np.random.default_rng()
+    if method == 'importance' and proposal is None:
+        proposal = _default_proposal(params)
+    rules = get_separation_rules(params.rules_file)
+    estimates = []
+    n_aircraft = 0
+    std_error = half_width = math.inf
+    while n_aircraft < max_aircraft:
+        estimate, simulated = _batch_estimate(hypothesis_type, batch_size, method, threshold, rng, params, rules,
+                                              proposal)
+        estimates.append(estimate)
+        n_aircraft += simulated
+        if len(estimates) >= max(min_batches, 2):
+            std_error = statistics.stdev(estimates) / math.sqrt(len(estimates))
+            half_width = _t_quantile(0.5 + confidence / 2, len(estimates) - 1) * std_error
+            if half_width <= tolerance:
+                break
+    return convergence_result(hypothesis_type, method, threshold, statistics.fmean(estimates), std_error, half_width,
+                              confidence, len(estimates), n_aircraft, half_width <= tolerance)
+
+
+class pair_state_counts:
+
+    def __init__(self, hypothesis_type: str = "hyp_1", separation_minima: float = DEFAULT_PARAMETERS.separation_minima,
+                 rules_file: str = None, counts: np.ndarray = None):
+        """
+            Lossless aggregate of a run: how many consecutive pairs of flights were seen in every (current, next)
+            pair of aircraft states. The categorical columns of a hyp1/hyp2 row are determined by the pair state and
+            calculated_minima by the state and the scoring setting kept here, so every aggregate of a trace can be
+            computed from the counts. Runs with the same setting merge by adding their counts.
+            :param hypothesis_type: "hyp_1" or "hyp_2", the weather rule the pairs are scored with
+            :param separation_minima: default separation minima defined (5 NM)
+            :param rules_file: separation rule file, the shipped rules if None
+            :param counts: N_STATES x N_STATES int64 counts, zeros if not given
+            >>> counts = pair_state_counts()
+            >>> counts.add_states(np.array([encode_state('cat_1', 'headwind', 'heavy', 'average'),
+            ...                             encode_state('cat_2', 'crosswind', 'super', 'high'),
+            ...                             encode_state('cat_2', 'crosswind', 'super', 'high')]))
+            >>> counts.total, round(counts.mean(), 6), counts.marginal('aircraft_weight_class')
+            (2, 4.4, {('heavy', 'super'): (1, 3.8), ('super', 'super'): (1, 5.0)})
+        """
+        self.hypothesis_type = hypothesis_type
+        self.separation_minima = separation_minima
+        self.rules_file = rules_file
+        self.counts = np.zeros((N_STATES, N_STATES), dtype=np.int64) if counts is None else counts
+
+    @property
+    def total(self) -> int:
+        return int(self.counts.sum())
+
+    def _setting(self) -> tuple:
+        return self.hypothesis_type, self.separation_minima, self.rules_file
+
+    def add_states(self, states: np.ndarray):
+        """
+            Counts the consecutive pairs of an array of aircraft states.
+        """
+        pairs = states[:-1].astype(np.intp) * N_STATES + states[1:]
+        self.counts += np.bincount(pairs, minlength=N_STATES * N_STATES).reshape(N_STATES, N_STATES)
+
+    def merge(self, other: 'pair_state_counts') -> 'pair_state_counts':
+        """
+            Adds the counts of another run scored with the same setting.
+        """
+        if other._setting() != self._setting():
+            raise ValueError("cannot merge counts scored with {} into counts scored with {}".format(
+                other._setting(), self._setting()))
+        self.counts += other.counts
+        return self
+
+    def separations(self) -> np.ndarray:
+        """
+            Separation minima of every pair state under the setting of the counts.
+        """
+        return get_separation_rules(self.rules_file).pair_table(self.hypothesis_type, self.separation_minima)
+
+    def mean(self) -> float:
+        """
+            Average separation minima (in NM) over all counted pairs.
+        """
+        observed = self.counts > 0
+        return float(np.dot(self.counts[observed], self.separations()[observed]) / self.counts[observed].sum())
+
+    def statistics(self) -> separation_statistics:
+        """
+            separation_statistics of all counted pairs.
+        """
+        observed = self.counts > 0
+        stats = separation_statistics()
+        stats.update_counts(self.separations()[observed], self.counts[observed])
+        return stats
+
+    def marginal(self, factor: str) -> dict:
+        """
+            Number of pairs and mean separation minima for every (current, next) category pair of one factor,
+            e.g. by weight class pair or by weather transition.
+            :param factor: one of PAIR_FACTORS
+            :return: dict mapping (category_1, category_2) to (count, mean separation), observed pairs only
+        """
+        codes = GROUND_TRAFFIC_TO_CONGESTION[_state_codes('ground_traffic')] if factor == 'air_traffic_congestion' \
+            else _state_codes(factor)
+        n_categories = len(FACTOR_TYPES[factor])
+        groups = (codes[:, None] * n_categories + codes[None, :]).ravel()
+        # unobserved pair states may have no separation (nan) under the hypothesis 2 weather rule
+        separations = np.where(self.counts > 0, self.separations(), 0.0).ravel()
+        counts = np.bincount(groups, weights=self.counts.ravel(), minlength=n_categories ** 2)
+        totals = np.bincount(groups, weights=self.counts.ravel() * separations, minlength=n_categories ** 2)
+        categories = FACTOR_TYPES[factor]
+        return {(categories[group // n_categories], categories[group % n_categories]):
+                (int(counts[group]), round(float(totals[group] / counts[group]), 9))
+                for group in np.flatnonzero(counts)}
+
+    def save(self, path: str):
+        """
+            Stores the counts sparsely (observed pair states only) in a compressed .npz file.
+        """
+        pairs = np.flatnonzero(self.counts)
+        metadata = {'hypothesis_type': self.hypothesis_type, 'separation_minima': self.separation_minima,
+                    'rules_file': self.rules_file, 'n_states': N_STATES}
+        np.savez_compressed(path, pairs=pairs.astype(np.int32), counts=self.counts.ravel()[pairs],
+                            metadata=json.dumps(metadata))
+
+    @classmethod
+    def load(cls, path: str) -> 'pair_state_counts':
+        """
+            Reads counts stored with save.
+        """
+        with np.load(path) as stored:
+            metadata = json.loads(str(stored['metadata']))
+            counts = np.zeros(N_STATES * N_STATES, dtype=np.int64)
+            counts[stored['pairs']] = stored['counts']
+        return cls(metadata['hypothesis_type'], metadata['separation_minima'], metadata['rules_file'],
+                   counts.reshape(N_STATES, N_STATES))
+
+    @classmethod
+    def from_csv(cls, path: str, hypothesis_type: str = "hyp_1",
+                 separation_minima: float = DEFAULT_PARAMETERS.separation_minima,
+                 rules_file: str = None) -> 'pair_state_counts':
+        """
+            Aggregates an exported hyp1/hyp2 CSV trace.
+        """
+        counts = np.zeros(N_STATES * N_STATES, dtype=np.int64)
+        with open(path, newline='') as csv_file:
+            for row in csv.DictReader(csv_file):
+                counts[encode_state(row['weather1'], row['wind1'], row['aircraft_weight_class1'],
+                                    row['ground_traffic1']) * N_STATES
+                       + encode_state(row['weather2'], row['wind2'], row['aircraft_weight_class2'],
+                                      row['ground_traffic2'])] += 1
+        return cls(hypothesis_type, separation_minima, rules_file, counts.reshape(N_STATES, N_STATES))
+
+
+def _state_codes(factor: str) -> np.ndarray:
+    """
+        Category code of one sampled factor for every aircraft state.
+    """
+    return np.unravel_index(np.arange(N_STATES), STATE_SHAPE)[SAMPLED_FACTORS.index(factor)]
+
+
+def count_pair_states(n_aircraft: int, hypothesis_type: str = "hyp_1", rng: np.random.Generator = None,
+                      params: model_parameters = DEFAULT_PARAMETERS, chunk_size: int = 1_000_000,
+                      trace: pair_record_buffer = None) -> pair_state_counts:
+    """
+        Simulates a landing sequence into a pair_state_counts aggregate, optionally also recording the raw trace.
+        :param n_aircraft: number of aircraft in the sequence
+        :param hypothesis_type: "hyp_1" or "hyp_2"
+        :param rng: numpy random generator
+        :param params: model parameters
+        :param chunk_size: aircraft simulated per batch
+        :param trace: optional pair_record_buffer receiving every pair
+        :return: pair_state_counts
+        >>> counts = count_pair_states(10_000, "hyp_1", np.random.default_rng(6))
+        >>> stats = simulate_separation_statistics(10_000, "hyp_1", np.random.default_rng(6))
+        >>> counts.total == stats.count, abs(counts.mean() - stats.mean) < 1e-9
+        (True, True)
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    rules = get_separation_rules(params.rules_file)
+    counts = pair_state_counts(hypothesis_type, params.separation_minima, params.rules_file)
+    previous = None
+    for start in range(0, n_aircraft, chunk_size):
+        sequence = sample_landing_sequence(min(chunk_size, n_aircraft - start), hypothesis_type, rng, params, start,
+                                           previous)
+        if previous is not None:
+            sequence = {factor: np.concatenate((previous[factor], codes)) for factor, codes in sequence.items()}
+        counts.add_states(encode_states(sequence))
+        if trace is not None:
+            trace.extend(sequence, score_landing_sequence(sequence, hypothesis_type, params.separation_minima, rules))
+        previous = {factor: codes[-1:] for factor, codes in sequence.items()}
+    return counts
+
+
+# bump when a change to the engines alters the results produced for a given configuration and seed
+ENGINE_VERSION = 2
+
+
+def configuration_digest(hypothesis_type: str, n_aircraft: int, seed: int,
+                         params: model_parameters = DEFAULT_PARAMETERS, chunk_size: int = 1_000_000) -> tuple:
+    """
+        Content address of a simulation: a SHA-256 over everything its result depends on - the model parameters,
+        the compiled delta tables (not the path of their rule file), the hypothesis, the seed, the run length and
+        the chunk size (which fixes how the random stream is consumed).
+        :return: (hex digest, configuration dict)
+        >>> digest, configuration = configuration_digest("hyp_1", 1000, 42)
+        >>> len(digest), digest == configuration_digest("hyp_1", 1000, 42, replace(DEFAULT_PARAMETERS,
+        ...                                                                  rules_file=DEFAULT_RULES_FILE))[0]
+        (64, True)
+        >>> digest == configuration_digest("hyp_1", 1000, 43)[0]
+        False
+    """
+    if seed is None:
+        raise ValueError("an unseeded run has no content address, resolve the seed first")
+    rules = get_separation_rules(params.rules_file)
+    tables = hashlib.sha256()
+    for name in sorted(rules.tables):
+        tables.update(name.encode())
+        tables.update(rules.tables[name].tobytes())
+    configuration = {parameter.name: getattr(params, parameter.name) for parameter in fields(model_parameters)
+                     if parameter.name != 'rules_file'}
+    configuration.update({'delta_tables': tables.hexdigest(), 'hypothesis_type': hypothesis_type,
+                          'n_aircraft': n_aircraft, 'seed': seed, 'chunk_size': chunk_size,
+                          'engine_version': ENGINE_VERSION})
+    canonical = json.dumps(configuration, sort_keys=True, default=list)
+    return hashlib.sha256(canonical.encode()).hexdigest(), configuration
+
+
+class result_cache:
+
+    def __init__(self, directory: str = '.simulation_cache'):
+        """
+            On-disk cache of simulation results keyed by configuration_digest. Every result is stored as a sparse
+            pair_state_counts file (<digest>.npz) next to the configuration that produced it (<digest>.json), and
+            interrupted runs leave a checkpoint (<digest>.checkpoint.npz) to resume from.
+            :param directory: cache directory, created on first write
+        """
+        self.directory = directory
+
+    def path(self, digest: str, suffix: str = '.npz') -> str:
+        return os.path.join(self.directory, digest + suffix)
+
+    def get(self, digest: str) -> pair_state_counts:
+        """
+            Cached result of a configuration, None if it has not been computed.
+        """
+        if not os.path.exists(self.path(digest)):
+            return None
+        return pair_state_counts.load(self.path(digest))
+
+    def put(self, digest: str, counts: pair_state_counts, configuration: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        _write_atomically(self.path(digest), counts.save)
+        _write_atomically(self.path(digest, '.json'), functools.partial(_write_json, configuration))
+
+    def save_checkpoint(self, digest: str, counts: pair_state_counts, n_done: int, previous: dict,
+                        rng: np.random.Generator):
+        """
+            Stores the progress of a run: the counts so far, the number of aircraft simulated, the codes of the last
+            aircraft (the running state of the block redraws) and the state of the random generator.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        state = {'n_done': n_done, 'bit_generator': rng.bit_generator.state,
+                 'previous': {factor: int(codes[0]) for factor, codes in previous.items()}}
+        _write_atomically(self.path(digest, '.checkpoint.npz'),
+                          lambda path: np.savez(path, counts=counts.counts, state=json.dumps(state)))
+
+    def load_checkpoint(self, digest: str) -> tuple:
+        """
+            (counts array, aircraft simulated, codes of the last aircraft, random generator state), or None.
+        """
+        if not os.path.exists(self.path(digest, '.checkpoint.npz')):
+            return None
+        with np.load(self.path(digest, '.checkpoint.npz')) as stored:
+            state = json.loads(str(stored['state']))
+            counts = stored['counts'].copy()
+        previous = {factor: np.array([code], dtype=np.int8) for factor, code in state['previous'].items()}
+        return counts, state['n_done'], previous, state['bit_generator']
+
+    def remove_checkpoint(self, digest: str):
+        if os.path.exists(self.path(digest, '.checkpoint.npz')):
+            os.remove(self.path(digest, '.checkpoint.npz'))
+
+
+def _write_json(data: dict, path: str):
+    with open(path, 'w') as json_file:
+        json.dump(data, json_file, indent=2, default=list)
+
+
+def _write_atomically(path: str, write):
+    """
+        Calls write on a temporary file and moves it into place, so an interruption never leaves a partial file. The
+        temporary file has a unique name in the directory of path, so concurrent writers do not clobber each other.
+    """
+    # imported on demand, only cache writes need it
+    import tempfile
+    directory, name = os.path.split(path)
+    root, extension = os.path.splitext(name)
+    descriptor, temporary = tempfile.mkstemp(suffix='.tmp' + extension, prefix=root + '.', dir=directory or '.')
+    os.close(descriptor)
+    try:
+        write(temporary)
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+def run_cached(n_aircraft: int, hypothesis_type: str = "hyp_1", seed: int = 0,
+               params: model_parameters = DEFAULT_PARAMETERS, chunk_size: int = 1_000_000,
+               cache: result_cache = None, checkpoint_every: int = 10) -> pair_state_counts:
+    """
+        Simulates a landing sequence into pair_state_counts through a result cache. A repeated request returns the
+        stored result without simulating; a run interrupted after a checkpoint resumes from it with the same random
+        stream, so the result is identical to an uninterrupted run.
+        :param n_aircraft: number of aircraft in the sequence
+        :param hypothesis_type: "hyp_1" or "hyp_2"
+        :param seed: seed of the random generator, part of the cache key; fresh entropy if None, recorded as the
+                     seed of the cached configuration
+        :param params: model parameters
+        :param chunk_size: aircraft simulated per batch
+        :param cache: result_cache, the default cache directory if not given
+        :param checkpoint_every: chunks simulated between checkpoints
+        :return: pair_state_counts
+        >>> import tempfile
+        >>> with tempfile.TemporaryDirectory() as directory:
+        ...     cache = result_cache(directory)
+        ...     first = run_cached(5000, "hyp_1", 3, chunk_size=1000, cache=cache)
+        ...     again = run_cached(5000, "hyp_1", 3, chunk_size=1000, cache=cache)
+        ...     unseeded = [run_cached(5000, seed=None, cache=cache) for i in range(2)]
+        >>> np.array_equal(again.counts, first.counts)
+        True
+        >>> np.array_equal(first.counts, count_pair_states(5000, "hyp_1", np.random.default_rng(3), chunk_size=1000).counts)
+        True
+        >>> np.array_equal(unseeded[0].counts, unseeded[1].counts)
+        False
+    """
+    cache = cache or result_cache()
+    if seed is None:
+        # an unseeded run must not hit the entry of an earlier unseeded run
+        seed = np.random.SeedSequence().entropy
+    digest, configuration = configuration_digest(hypothesis_type, n_aircraft, seed, params, chunk_size)
+    cached = cache.get(digest)
+    if cached is not None:
+        return cached
+    rng = np.random.default_rng(seed)
+    counts = pair_state_counts(hypothesis_type, params.separation_minima, params.rules_file)
+    n_done = 0
+    previous = None
+    checkpoint = cache.load_checkpoint(digest)
+    if checkpoint is not None:
+        counts.counts, n_done, previous, rng.bit_generator.state = checkpoint
+    for chunk_index, start in enumerate(range(n_done, n_aircraft, chunk_size), start=1):
+        sequence = sample_landing_sequence(min(chunk_size, n_aircraft - start), hypothesis_type, rng, params, start,
+                                           previous)
+        if previous is not None:
+            sequence = {factor: np.concatenate((previous[factor], codes)) for factor, codes in sequence.items()}
+        counts.add_states(encode_states(sequence))
+        previous = {factor: codes[-1:] for factor, codes in sequence.items()}
+        if chunk_index % checkpoint_every == 0 and start + chunk_size < n_aircraft:
+            cache.save_checkpoint(digest, counts, start + chunk_size, previous, rng)
+    cache.put(digest, counts, configuration)
+    cache.remove_checkpoint(digest)
+    return counts
+
+
+TRACE_MAGIC = b'SEPTRACE'
+TRACE_VERSION = 2
+# header: magic, version (uint16), length of the JSON header (uint32), JSON header padded so chunks start 64-byte aligned
+TRACE_PREFIX = struct.Struct('<8sHI')
+TRACE_COLUMN_DTYPES = {**{column: np.dtype(np.int8) for column in PAIR_RECORD_COLUMNS[:-1]},
+                       'calculated_minima': np.dtype('<f4')}
+# footer: (offset, rows) of every chunk, then the number of chunks (uint64) and the index magic
+TRACE_INDEX_DTYPE = np.dtype([('offset', '<u8'), ('rows', '<u8')])
+TRACE_FOOTER = struct.Struct('<Q8s')
+TRACE_INDEX_MAGIC = b'SEPINDEX'
+
+
+def _trace_column_offsets(n_rows: int) -> dict:
+    """
+        Offset of every column block from the start of a trace chunk of n_rows rows, and the size of the chunk.
+        Column blocks are padded to 8 bytes so that every block stays aligned.
+        >>> offsets, size = _trace_column_offsets(10)
+        >>> offsets['weather2'], offsets['calculated_minima'], size
+        (16, 160, 200)
+    """
+    offsets, size = {}, 0
+    for column in PAIR_RECORD_COLUMNS:
+        offsets[column] = size
+        size += -(-n_rows * TRACE_COLUMN_DTYPES[column].itemsize // 8) * 8
+    return offsets, size
+
+
+def _trace_header(metadata: dict) -> dict:
+    return {'columns': PAIR_RECORD_COLUMNS,
+            'vocabularies': {column: FACTOR_TYPES[column[:-1]] for column in PAIR_RECORD_COLUMNS[:-1]},
+            'column_dtypes': {column: dtype.str for column, dtype in TRACE_COLUMN_DTYPES.items()},
+            'metadata': metadata or {}}
+
+
+def _read_trace_layout(trace_file) -> tuple:
+    """
+        (header, chunk index, offset of the footer) of an open trace file.
+    """
+    magic, version, header_length = TRACE_PREFIX.unpack(trace_file.read(TRACE_PREFIX.size))
+    if magic != TRACE_MAGIC or version != TRACE_VERSION:
+        raise ValueError("{} is not a version {} separation trace".format(trace_file.name, TRACE_VERSION))
+    header = json.loads(trace_file.read(header_length))
+    trace_file.seek(-TRACE_FOOTER.size, os.SEEK_END)
+    n_chunks, index_magic = TRACE_FOOTER.unpack(trace_file.read(TRACE_FOOTER.size))
+    if index_magic != TRACE_INDEX_MAGIC:
+        raise ValueError("{} has no chunk index, its writer was not closed".format(trace_file.name))
+    footer = trace_file.seek(-TRACE_FOOTER.size - n_chunks * TRACE_INDEX_DTYPE.itemsize, os.SEEK_END)
+    index = np.frombuffer(trace_file.read(n_chunks * TRACE_INDEX_DTYPE.itemsize), dtype=TRACE_INDEX_DTYPE)
+    return header, index, footer
+
+
+class binary_trace_writer:
+
+    def __init__(self, path: str, metadata: dict = None, append: bool = False):
+        """
+            Writer of columnar binary pair traces. Every chunk written is stored as one contiguous block per column
+            (int8 codes for the category columns, float32 calculated_minima, 14 bytes per pair), so reading a column
+            touches only the bytes of that column. A header records the category vocabularies, the column types and
+            run metadata, and a footer written on close indexes the offset and row count of every chunk. It has the
+            write/close interface of chunked_csv_exporter, so a pair_record_buffer can flush into it chunk by chunk.
+            :param path: output trace file
+            :param metadata: JSON serializable run metadata, e.g. hypothesis, seed and parameters
+            :param append: add chunks to an existing trace, whose header must match, instead of replacing it
+            >>> import tempfile
+            >>> with tempfile.TemporaryDirectory() as directory:
+            ...     path = os.path.join(directory, 'hyp1.septrace')
+            ...     for metadata in ({'seed': 1}, {'seed': 1}, {'seed': 2}):
+            ...         try:
+            ...             with binary_trace_writer(path, metadata, append=True) as writer:
+            ...                 writer.write({column: np.zeros(3) for column in PAIR_RECORD_COLUMNS})
+            ...         except ValueError as error:
+            ...             print(error)
+            ...     len(binary_trace(path)), len(binary_trace(path).index)
+            hyp1.septrace was written with a different header, it cannot be appended to
+            (6, 2)
+        """
+        self.path = path
+        self.rows_written = 0
+        header = _trace_header(metadata)
+        if append and os.path.exists(path):
+            with open(path, 'rb') as trace_file:
+                stored, index, footer = _read_trace_layout(trace_file)
+            if stored != json.loads(json.dumps(header, default=list)):
+                raise ValueError("{} was written with a different header, it cannot be appended to"
+                                 .format(os.path.basename(path)))
+            self.index = [tuple(int(value) for value in chunk) for chunk in index]
+            self.file = open(path, 'r+b')
+            self.file.seek(footer)
+            self.file.truncate()
+        else:
+            header = json.dumps(header, default=list).encode()
+            header += b' ' * (-(TRACE_PREFIX.size + len(header)) % 64)
+            self.index = []
+            self.file = open(path, 'wb')
+            self.file.write(TRACE_PREFIX.pack(TRACE_MAGIC, TRACE_VERSION, len(header)) + header)
+
+    def write(self, columns: dict):
+        """
+            Appends rows given as columns keyed by PAIR_RECORD_COLUMNS, as one chunk of column blocks.
+        """
+        n_rows = len(columns['calculated_minima'])
+        if not n_rows:
+            return
+        with INSTRUMENTATION.stage('export'):
+            offset = self.file.tell()
+            offsets, size = _trace_column_offsets(n_rows)
+            for column in PAIR_RECORD_COLUMNS:
+                block = np.ascontiguousarray(columns[column], dtype=TRACE_COLUMN_DTYPES[column]).tobytes()
+                self.file.write(block + bytes(-len(block) % 8))
+            self.index.append((offset, n_rows))
+        self.rows_written += n_rows
+        INSTRUMENTATION.count('rows_exported', n_rows)
+        INSTRUMENTATION.count('bytes_written', size)
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.file.write(np.array(self.index, dtype=TRACE_INDEX_DTYPE).tobytes()
+                        + TRACE_FOOTER.pack(len(self.index), TRACE_INDEX_MAGIC))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class binary_trace:
+
+    def __init__(self, path: str):
+        """
+            Read-only view of a binary pair trace. The file is memory-mapped, so opening a trace of any size is
+            instant; a column of a single chunk is a zero-copy NumPy view into the file, and a column of several
+            chunks is gathered from its blocks without reading the other columns.
+            :param path: trace file written by binary_trace_writer
+            >>> import tempfile
+            >>> with tempfile.TemporaryDirectory() as directory:
+            ...     path = os.path.join(directory, 'hyp1.septrace')
+            ...     with binary_trace_writer(path, {'hypothesis_type': 'hyp_1'}) as writer:
+            ...         buffer = pair_record_buffer(chunk_rows=1000, exporter=writer)
+            ...         for sequence, separations in iterate_landing_sequence(2500, rng=np.random.default_rng(1)):
+            ...             buffer.extend(sequence, separations)
+            ...         buffer.flush()
+            ...     trace = binary_trace(path)
+            ...     wind = [chunk['wind1'] for chunk in trace.chunks()]
+            ...     len(trace), trace.metadata, trace.index['rows'].tolist(), wind[0].base is not None
+            (2499, {'hypothesis_type': 'hyp_1'}, [1000, 1000, 499], True)
+        """
+        self.path = path
+        with open(path, 'rb') as trace_file:
+            header, self.index, footer = _read_trace_layout(trace_file)
+        self.vocabularies = header['vocabularies']
+        self.metadata = header['metadata']
+        self.dtypes = {column: np.dtype(dtype) for column, dtype in header['column_dtypes'].items()}
+        self._data = np.memmap(path, dtype=np.uint8, mode='r', shape=(footer,)) if footer \
+            else np.empty(0, dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return int(self.index['rows'].sum())
+
+    def _block(self, offset: int, n_rows: int, column: str) -> np.ndarray:
+        start = offset + _trace_column_offsets(n_rows)[0][column]
+        return self._data[start:start + n_rows * self.dtypes[column].itemsize].view(self.dtypes[column])
+
+    def chunks(self, columns: tuple = PAIR_RECORD_COLUMNS):
+        """
+            Zero-copy views of the columns of every chunk, in the order the chunks were written.
+        """
+        for offset, n_rows in self.index.tolist():
+            yield {column: self._block(offset, n_rows, column) for column in columns}
+
+    def column(self, column: str) -> np.ndarray:
+        """
+            One column over all chunks, category columns as int8 codes; only its own blocks are read.
+        """
+        blocks = [chunk[column] for chunk in self.chunks((column,))]
+        if len(blocks) == 1:
+            return blocks[0]
+        return np.concatenate(blocks) if blocks else np.empty(0, dtype=self.dtypes[column])
+
+    def columns(self) -> dict:
+        """
+            Every column over all chunks, see column.
+        """
+        return {column: self.column(column) for column in PAIR_RECORD_COLUMNS}
+
+    def decode(self, column: str) -> np.ndarray:
+        """
+            A category column as strings.
+        """
+        return np.array(self.vocabularies[column], dtype=object)[self.column(column)]
+
+    def to_csv(self, path: str, chunk_rows: int = 100_000):
+        """
+            Exports the trace in the hyp1/hyp2 CSV layout, at most chunk_rows at a time. calculated_minima is stored
+            as float32 and written rounded to 6 decimals, which recovers the 0.1 NM grid of the model.
+        """
+        with chunked_csv_exporter(path, chunk_rows) as exporter:
+            for chunk in self.chunks():
+                for start in range(0, len(chunk['calculated_minima']), chunk_rows):
+                    columns = {column: chunk[column][start:start + chunk_rows] for column in PAIR_RECORD_COLUMNS[:-1]}
+                    columns['calculated_minima'] = np.round(
+                        chunk['calculated_minima'][start:start + chunk_rows].astype(np.float64), 6)
+                    exporter.write(columns)
+
+
+SEPARATION_POLICIES = ('fixed', 'simulated')
+
+
+@dataclass(frozen=True)
+class airport_config:
+    """
+        An airport of the landing queue simulation:
+            name: label of the airport in the results
+            n_runways: number of arrival runways, each landing its own sequence of aircraft
+            arrival_rate: aircraft per hour arriving to the approach (Poisson arrivals)
+            approach_speed: ground speed on final approach in knots, converts separations (NM) into time
+            hypothesis_type: "hyp_1" or "hyp_2" (prolonged worst weather at this airport)
+    """
+    name: str
+    n_runways: int = 1
+    arrival_rate: float = 30.0
+    approach_speed: float = 140.0
+    hypothesis_type: str = "hyp_1"
+
+
+@dataclass(frozen=True)
+class airport_throughput:
+    """
+        Landing queue results of one airport under one separation policy over the simulated horizon.
+    """
+    airport: str
+    policy: str
+    n_runways: int
+    arrivals: int
+    landings: int
+    throughput_per_hour: float
+    mean_delay_minutes: float
+    max_delay_minutes: float
+    mean_queue_length: float
+    max_queue_length: int
+    runway_utilization: float
+
+
+# aircraft sampled at a time for the landing sequence of an airport of the queue simulation
+QUEUE_SAMPLE_SIZE = 4096
+
+
+class _airport_queue:
+
+    def __init__(self, airport: airport_config, seed: int, policy: str, params: model_parameters):
+        """
+            State of one airport in the discrete-event simulation: its own seeded streams of arrivals and of aircraft
+            (so each airport has its own weather, wind and ground traffic regimes), its runways with their previous
+            landing, and the queue statistics. Aircraft are sampled from params QUEUE_SAMPLE_SIZE at a time, their
+            blocks continuing across batches, and scored with the rules of params.rules_file.
+        """
+        self.airport = airport
+        self.rng = random.Random(seed)
+        self.aircraft_rng = np.random.default_rng(seed)
+        self.params = params
+        self.table = get_separation_rules(params.rules_file).pair_table(airport.hypothesis_type,
+                                                                        params.separation_minima).tolist()
+        self.policy = policy
+        self.separation_minima = params.separation_minima
+        self.states = iter(())
+        self.n_sampled = 0
+        self.previous = None
+        # (time the previous landing happened, state of the previous lander or None) of every runway
+        self.runways = [(0.0, None)] * airport.n_runways
+        self.arrivals = 0
+        self.landings = 0
+        self.total_delay = 0.0
+        self.max_delay = 0.0
+        self.busy_time = 0.0
+        self.queue_length = 0
+        self.max_queue_length = 0
+        self.queue_area = 0.0
+        self.last_event_time = 0.0
+
+    def next_arrival(self, time: float) -> float:
+        return time + self.rng.expovariate(self.airport.arrival_rate)
+
+    def next_state(self) -> int:
+        """
+            Encoded state of the next arriving aircraft of the airport's landing sequence.
+        """
+        state = next(self.states, None)
+        if state is None:
+            sequence = sample_landing_sequence(QUEUE_SAMPLE_SIZE, self.airport.hypothesis_type, self.aircraft_rng,
+                                               self.params, self.n_sampled, self.previous)
+            self.states = iter(encode_states(sequence).tolist())
+            self.n_sampled += QUEUE_SAMPLE_SIZE
+            self.previous = sequence
+            state = next(self.states)
+        return state
+
+    def advance(self, time: float):
+        # time-weighted integral of the number of aircraft waiting or on final approach
+        self.queue_area += self.queue_length * (time - self.last_event_time)
+        self.last_event_time = time
+
+    def land(self, time: float) -> float:
+        """
+            Sequences an arriving aircraft on the runway whose next slot for it opens first, and returns its landing
+            time: the previous landing on that runway plus the separation behind its previous lander, converted to
+            time at the approach speed. Slots depend on the pair of aircraft, so every runway is considered.
+        """
+        state = self.next_state()
+        slots = [self._spacing(runway, state) for runway in self.runways]
+        runway = min(range(len(slots)), key=lambda index: sum(slots[index]))
+        previous_landing, spacing = slots[runway]
+        landing = max(time, previous_landing + spacing)
+        self.runways[runway] = (landing, state)
+        self.busy_time += spacing
+        delay = landing - time
+        self.total_delay += delay
+        self.max_delay = max(self.max_delay, delay)
+        return landing
+
+    def _spacing(self, runway: tuple, state: int) -> tuple:
+        """
+            (previous landing, time spacing behind the previous lander) of an aircraft of the given state on a
+            runway.
+        """
+        previous_landing, previous_state = runway
+        if previous_state is None:
+            return previous_landing, 0.0
+        separation = self.table[previous_state][state] if self.policy == 'simulated' else self.separation_minima
+        return previous_landing, separation / self.airport.approach_speed
+
+    def result(self, horizon: float) -> airport_throughput:
+        self.advance(horizon)
+        return airport_throughput(self.airport.name, self.policy, self.airport.n_runways, self.arrivals,
+                                  self.landings, self.landings / horizon,
+                                  60 * self.total_delay / max(self.arrivals, 1), 60 * self.max_delay,
+                                  self.queue_area / horizon, self.max_queue_length,
+                                  min(self.busy_time / (horizon * self.airport.n_runways), 1.0))
+
+
+def _simulate_airport_shard(task: tuple) -> list:
+    """
+        Discrete-event simulation of a shard of airports on one event heap. Events are (time, sequence number,
+        airport index, kind); an arrival schedules the next arrival of its airport and the landing of the aircraft,
+        a landing takes it out of the queue. Aircraft arriving before the horizon are simulated until they land,
+        throughput counts the landings and the queue statistics cover the time within the horizon.
+    """
+    airports, seeds, horizon, policy, params = task
+    queues = [_airport_queue(airport, seed, policy, params) for airport, seed in zip(airports, seeds)]
+    events = []
+    sequence_number = itertools.count()
+    for index, queue in enumerate(queues):
+        heapq.heappush(events, (queue.next_arrival(0.0), next(sequence_number), index, 'arrival'))
+    while events:
+        time, _, index, kind = heapq.heappop(events)
+        queue = queues[index]
+        # the queue length changes at every event, so the time before it is accounted for up to the horizon
+        queue.advance(min(time, horizon))
+        if kind == 'arrival':
+            queue.arrivals += 1
+            queue.queue_length += 1
+            queue.max_queue_length = max(queue.max_queue_length, queue.queue_length)
+            heapq.heappush(events, (queue.land(time), next(sequence_number), index, 'landing'))
+            next_arrival = queue.next_arrival(time)
+            if next_arrival <= horizon:
+                heapq.heappush(events, (next_arrival, next(sequence_number), index, 'arrival'))
+        else:
+            queue.queue_length -= 1
+            if time <= horizon:
+                queue.landings += 1
+    return [queue.result(horizon) for queue in queues]
+
+
+def simulate_landing_queues(airports: list, horizon_hours: float = 24.0, policy: str = 'simulated', seed: int = 0,
+                            workers: int = 1, params: model_parameters = DEFAULT_PARAMETERS,
+                            shard_size: int = 64) -> list:
+    """
+        Discrete-event simulation of the arrival queues of many airports and runways. Airports are independent, so
+        they are sharded across processes; each airport draws from its own stream seeded from
+        np.random.SeedSequence(seed), so results do not depend on the number of workers or the sharding, and the
+        same seed gives the same arrivals and aircraft under every policy (a paired comparison).
+        :param airports: airport_config of every airport
+        :param horizon_hours: simulated time in hours
+        :param policy: 'fixed' spaces every pair at params.separation_minima, 'simulated' at the calculated separation
+        :param seed: root seed
+        :param workers: number of worker processes, 1 runs in this process
+        :param params: model parameters of the sampled aircraft and their separation rules
+        :param shard_size: airports simulated on one event heap
+        :return: airport_throughput of every airport, in the order of airports
+        >>> airports = [airport_config('A', n_runways=2, arrival_rate=60), airport_config('B', arrival_rate=20)]
+        >>> fixed = simulate_landing_queues(airports, 12, 'fixed', seed=3)
+        >>> simulated = simulate_landing_queues(airports, 12, 'simulated', seed=3, workers=2, shard_size=1)
+        >>> [result.arrivals for result in fixed] == [result.arrivals for result in simulated]
+        True
+        >>> fixed[0].mean_delay_minutes > simulated[0].mean_delay_minutes
+        True
+        >>> result = simulate_landing_queues([airport_config('B', arrival_rate=20)], 200, seed=1)[0]
+        >>> abs(result.mean_queue_length - result.arrivals / 200 * result.mean_delay_minutes / 60) < 0.01
+        True
+    """
+    if policy not in SEPARATION_POLICIES:
+        raise ValueError("policy must be one of {}".format(', '.join(SEPARATION_POLICIES)))
+    seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(len(airports))]
+    tasks = [(airports[start:start + shard_size], seeds[start:start + shard_size], horizon_hours, policy, params)
+             for start in range(0, len(airports), shard_size)]
+    if workers == 1:
+        shards = map(_simulate_airport_shard, tasks)
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            shards = list(executor.map(_simulate_airport_shard, tasks))
+    return [result for shard in shards for result in shard]
+
+
+def compare_separation_policies(airports: list, horizon_hours: float = 24.0, seed: int = 0, workers: int = 1,
+                                params: model_parameters = DEFAULT_PARAMETERS) -> list:
+    """
+        Throughput and queue delay of every airport when the fixed 5 NM minimum is replaced by the simulated
+        minima, on the same arrivals and aircraft.
+        :return: tidy rows, one per airport and policy
+    """
+    rows = []
+    for policy in SEPARATION_POLICIES:
+        for result in simulate_landing_queues(airports, horizon_hours, policy, seed, workers, params):
+            rows.append(asdict(result))
+    return rows
+
+
+# file extension of every export format of the command line, 'none' keeps the statistics only
+OUTPUT_FORMATS = {'csv': '.csv', 'binary': '.septrace', 'counts': '.npz', 'none': None}
+
+
+def _argument_parser():
+    """
+        Parser of the command line options of main.
+    """
+    # imported on demand, library use of the module does not need it
+    import argparse
+
+    def at_least(minimum: int):
+        def parse(value: str) -> int:
+            number = int(value)
+            if number < minimum:
+                raise argparse.ArgumentTypeError("must be at least {}, got {}".format(minimum, number))
+            return number
+        return parse
+
+    parser = argparse.ArgumentParser(
+        prog='2022Spring_Finals.py',
+        description="Simulates landing sequences and reports the calculated separation minima of every scenario.")
+    parser.add_argument('-n', '--aircraft', type=at_least(2), default=1000, help="aircraft per landing sequence")
+    parser.add_argument('-r', '--replications', type=at_least(1), default=1,
+                        help="independent replications of every scenario, reported with a confidence interval")
+    parser.add_argument('--seed', type=int, default=None, help="root seed, fresh entropy if not given")
+    parser.add_argument('--workers', type=at_least(0), default=1,
+                        help="worker processes for replications, 0 uses all cores")
+    parser.add_argument('--scenarios', nargs='+', default=list(HYPOTHESIS_SCENARIOS),
+                        choices=list(HYPOTHESIS_SCENARIOS),
+                        help="scenarios to simulate; without export the vectorized engine scores them all on the same "
+                             "flights and reports their paired differences")
+    parser.add_argument('--engine', choices=('vectorized', 'pipeline'), default='vectorized',
+                        help="batched numpy engine, or the per-aircraft pipeline of the decider classes (single runs)")
+    parser.add_argument('--format', choices=list(OUTPUT_FORMATS), default=None,
+                        help="export of the pairs of a single run (default csv, none with replications)")
+    parser.add_argument('--output', default='{scenario}_small{ext}',
+                        help="output path pattern; {scenario} is the scenario name without underscores and {ext} "
+                             "the extension of the format (default: %(default)s)")
+    parser.add_argument('--cache-dir', metavar='PATH',
+                        help="serve seeded vectorized runs from a result cache in this directory, computing and "
+                             "storing them on a miss; scenarios are then run on their own streams, without pairing")
+    parser.add_argument('--profile-report', metavar='PATH',
+                        help="write per-stage timings and counters of the run to a JSON file")
+    parser.add_argument('--startup-time', action='store_true',
+                        help="print the startup time breakdown of the process to stderr")
+    parser.add_argument('--doctest', action='store_true', help="run the doctests of the module and exit")
+    return parser
+
+
+def _startup_breakdown(parsed: float, finished: float) -> list:
+    """
+        Startup checkpoints of the process as (phase, seconds) rows.
+    """
+    started, interpreter_cpu = _STARTUP_MARKS['start']
+    return [('interpreter (cpu)', interpreter_cpu),
+            ('imports', _STARTUP_MARKS['imports'] - started),
+            ('module setup', _STARTUP_MARKS['setup'] - _STARTUP_MARKS['imports']),
+            ('argument parsing', parsed - _STARTUP_MARKS['setup']),
+            ('simulation and export', finished - parsed)]
+
+
+def _run_scenario(scenario: str, args, seed_sequence: np.random.SeedSequence, path: str) -> separation_statistics:
+    """
+        Simulates one landing sequence of a scenario, exporting its pairs to path in args.format, or serves it from
+        the result cache of args.cache_dir.
+    """
+    seed = int(seed_sequence.generate_state(1)[0])
+    if args.cache_dir is not None:
+        counts = run_cached(args.aircraft, scenario, seed, cache=result_cache(args.cache_dir))
+        if args.format == 'counts':
+            counts.save(path)
+        return counts.statistics()
+    stats = separation_statistics()
+    metadata = {'hypothesis_type': scenario, 'n_aircraft': args.aircraft, 'seed': args.seed, 'engine': args.engine}
+    with contextlib.ExitStack() as stack:
+        exporter = None
+        if args.format == 'csv':
+            exporter = stack.enter_context(chunked_csv_exporter(path))
+        elif args.format == 'binary':
+            exporter = stack.enter_context(binary_trace_writer(path, metadata))
+        records = None if exporter is None else pair_record_buffer(exporter=exporter)
+        if args.engine == 'pipeline':
+            rng = random.Random(seed)
+            aircraft = generate_aircraft(args.aircraft, scenario, weather_decider(rng), wind_decider(rng),
+                                         weight_decider(rng), ground_traffic_decider(rng))
+            consumers = [statistics_stage(stats)] + ([] if records is None else [records.append])
+            run_pair_pipeline(score_pairs(pair_stream(aircraft), scenario), *consumers)
+        else:
+            counts = pair_state_counts(scenario) if args.format == 'counts' else None
+            for sequence, separations in iterate_landing_sequence(args.aircraft, scenario, np.random.default_rng(seed)):
+                stats.update(separations)
+                if records is not None:
+                    records.extend(sequence, separations)
+                if counts is not None:
+                    counts.add_states(encode_states(sequence))
+            if counts is not None:
+                counts.save(path)
+        if records is not None:
+            records.flush()
+    return stats
+
+
+def main(argv: list = None) -> int:
+    """
+        Command line entry point: simulates every requested scenario and prints the calculated separation minima,
+        or runs the doctests with --doctest.
+        :param argv: command line arguments, sys.argv[1:] if not given
+        :return: exit status
+        >>> main(['-n', '2000', '--seed', '3', '--format', 'none', '--scenarios', 'hyp_2'])
+        The final calculated separation minima for hypothesis 2 is 5.695
+        Standard deviation 1.056 NM, median 6.0 NM, 0.0% of pairs below 3 NM
+        0
+        >>> import tempfile
+        >>> with tempfile.TemporaryDirectory() as directory:
+        ...     for i in range(2):
+        ...         status = main(['-n', '2000', '--seed', '3', '--format', 'none', '--scenarios', 'hyp_2',
+        ...                        '--cache-dir', directory])
+        ...     cached = sorted(os.path.splitext(name)[1] for name in os.listdir(directory))
+        The final calculated separation minima for hypothesis 2 is 5.695
+        Standard deviation 1.056 NM, median 6.0 NM, 0.0% of pairs below 3 NM
+        The final calculated separation minima for hypothesis 2 is 5.695
+        Standard deviation 1.056 NM, median 6.0 NM, 0.0% of pairs below 3 NM
+        >>> cached
+        ['.json', '.npz']
+        >>> main(['-n', '2000', '--seed', '3', '--format', 'none'])
+        The final calculated separation minima for hypothesis 1 is 4.704
+        Standard deviation 1.063 NM, median 5.0 NM, 0.7% of pairs below 3 NM
+        <BLANKLINE>
+        The final calculated separation minima for hypothesis 2 is 5.704
+        Standard deviation 1.057 NM, median 6.0 NM, 0.0% of pairs below 3 NM
+        <BLANKLINE>
+        Paired difference hyp_2 - hyp_1: mean +1.000 NM, 99.8% of pairs differ by at most 2 NM
+        0
+    """
+    parser = _argument_parser()
+    args = parser.parse_args(argv)
+    parsed = time.perf_counter()
+    if args.doctest:
+        import doctest
+        result = doctest.testmod(sys.modules[__name__])
+        print(result)
+        return 1 if result.failed else 0
+    if args.format is None:
+        args.format = 'csv' if args.replications == 1 else 'none'
+    if args.replications > 1 and args.format != 'none':
+        parser.error("exports are written for single runs, use --format none with --replications")
+    if args.format == 'counts' and args.engine != 'vectorized':
+        parser.error("counts are collected by the vectorized engine")
+    if args.replications > 1 and args.engine != 'vectorized':
+        parser.error("replications are run by the vectorized engine")
+    if args.cache_dir is not None:
+        if args.seed is None:
+            parser.error("--cache-dir serves seeded runs, give a --seed")
+        if args.replications > 1 or args.engine != 'vectorized' or args.format not in ('none', 'counts'):
+            parser.error("the cache stores pair counts of single vectorized runs, use --format none or counts")
+    args.scenarios = list(dict.fromkeys(args.scenarios))
+    # without exports, the scenarios are scored on one shared stream of flights so they compare pair by pair
+    paired = (args.replications == 1 and args.format == 'none' and args.engine == 'vectorized'
+              and len(args.scenarios) > 1 and args.cache_dir is None)
+
+    with contextlib.ExitStack() as stack:
+        instrumentation = stack.enter_context(instrumented_run()) if args.profile_report else None
+        seed_sequences = np.random.SeedSequence(args.seed).spawn(len(args.scenarios))
+        if paired:
+            results = evaluate_scenarios(args.scenarios, args.aircraft, np.random.default_rng(args.seed))
+        for i, (scenario, seed_sequence) in enumerate(zip(args.scenarios, seed_sequences)):
+            number = scenario.split('_')[-1]
+            if args.replications > 1:
+                summary = run_replications(scenario, args.replications, args.aircraft,
+                                           int(seed_sequence.generate_state(1)[0]), args.workers or None)
+                print("{}The final calculated separation minima for hypothesis {} is {} ({:.0%} CI {:.3f} - {:.3f})"
+                      .format('\n' if i else '', number, round(summary.mean, 3), summary.confidence, summary.ci_low,
+                              summary.ci_high))
+                stats = summary.pair_statistics
+            else:
+                if paired:
+                    stats = results.statistics[scenario]
+                else:
+                    path = None
+                    if args.format != 'none':
+                        path = args.output.format(scenario=scenario.replace('_', ''), ext=OUTPUT_FORMATS[args.format])
+                    stats = _run_scenario(scenario, args, seed_sequence, path)
+                print("{}The final calculated separation minima for hypothesis {} is {}".format(
+                    '\n' if i else '', number, round(stats.mean, 3)))
+            print("Standard deviation {:.3f} NM, median {} NM, {:.1%} of pairs below 3 NM".format(
+                stats.std, stats.quantile(0.5), stats.fraction_below(3)))
+        if paired:
+            for scenario, difference in results.differences.items():
+                print("\nPaired difference {} - {}: mean {:+.3f} NM, {:.1%} of pairs differ by at most 2 NM".format(
+                    scenario, results.baseline, difference.mean, difference.fraction_at_most(2)))
+        if instrumentation is not None:
+            instrumentation.write_report(args.profile_report)
+
+    if args.startup_time:
+        for phase, seconds in _startup_breakdown(parsed, time.perf_counter()):
+            print("{:<24}{:8.1f} ms".format(phase, seconds * 1000), file=sys.stderr)
+    return 0
+
+
+_STARTUP_MARKS['setup'] = time.perf_counter()
 
 
 if __name__ == '__main__':
-    import doctest
-    #import 2022Spring_Finals
-
-    print(doctest.testmod())
-
-    airplane_objects_dict = {}
-    weather_decider = weather_decider()
-    wind_decider = wind_decider()
-    weight_decider = weight_decider()
-    ground_traffic_decider = ground_traffic_decider()
-    distance_list_hyp1 = []
-    distance_list_hyp2 = []
-
-    # 5 NM is the recommended separation minima according to ICAO
-    separation_minima = 5
-
-    #creating dataframe to export simulation data
-    hyp1_header = ['weather1', 'weather2', 'wind1', 'wind2', 'aircraft_weight_class1', 'aircraft_weight_class2', 'ground_traffic1', 'ground_traffic2', 'air_traffic_congestion1', 'air_traffic_congestion2', 'calculated_minima']
-    df1 = pd.DataFrame(columns=hyp1_header)
-    df2 = pd.DataFrame(columns=hyp1_header)
-
-
-    # https://stackoverflow.com/questions/21598872/how-to-create-multiple-class-objects-with-a-loop-in-python
-    for i in range(1, 1001):
-        name = 'airplane_{}'.format(i)
-        airplane_objects_dict[name] = airplane_attributes(weather_decider, wind_decider, weight_decider, ground_traffic_decider, "hyp_1")
-        if i > 1:
-            airplane_name_1 = 'airplane_{}'.format(i - 1)
-            airplane_name_2 = 'airplane_{}'.format(i)
-            a1 = airplane_objects_dict[airplane_name_1].__dict__
-            b1 = airplane_objects_dict[airplane_name_2].__dict__
-            distance_affected_due_weather = calculate_dist_affected_due_weather(a1['weather'], b1['weather'], separation_minima)
-            distance_affected_due_wind = calculate_dist_affected_due_wind(a1['wind'], b1['wind'], distance_affected_due_weather)
-            distance_affected_due_aircraft_weight_class = calculate_dist_affected_due_aircraft_weight_class\
-                (a1['aircraft_weight_class'], b1['aircraft_weight_class'], distance_affected_due_wind)
-            distance_affected_due_ground_traffic = calculate_dist_affected_due_ground_traffic\
-                (a1['ground_traffic'], b1['ground_traffic'], distance_affected_due_aircraft_weight_class)
-            distance_affected_due_air_traffic_congestion = calculate_dist_affected_due_air_traffic_congestion\
-                (a1['air_traffic_congestion'], b1['air_traffic_congestion'], distance_affected_due_ground_traffic)
-            temp_optimized_separation_minima = distance_affected_due_air_traffic_congestion
-
-            to_append = [a1['weather'], b1['weather'], a1['wind'], b1['wind'], a1['aircraft_weight_class'], b1['aircraft_weight_class'],\
-                           a1['ground_traffic'], b1['ground_traffic'], a1['air_traffic_congestion'], b1['air_traffic_congestion'], distance_affected_due_ground_traffic]
-            a_series = pd.Series(to_append, index=df1.columns)
-            df1 = df1.append(a_series, ignore_index=True)
-            distance_list_hyp1.append(temp_optimized_separation_minima)
-
-    # exporting to csv
-    df1.to_csv('hyp1_small.csv')
-    optimized_separation_minima_hyp1 = sum(distance_list_hyp1)/len(distance_list_hyp1)
-    output_hyp1 = round(optimized_separation_minima_hyp1, 3)
-    print("The final calculated separation minima for hypothesis 1 is {}".format(output_hyp1))
-
-
-    # Testing Hypothesis-2:
-    for i in range(1, 1001):
-     name = 'airplane_{}'.format(i)
-     airplane_objects_dict[name] = airplane_attributes(weather_decider, wind_decider, weight_decider, ground_traffic_decider, "hyp_2")
-     if i > 1:
-         airplane_name_1 = 'airplane_{}'.format(i - 1)
-         airplane_name_2 = 'airplane_{}'.format(i)
-         a2 = airplane_objects_dict[airplane_name_1].__dict__
-         b2 = airplane_objects_dict[airplane_name_2].__dict__
-         distance_affected_due_weather = calculate_dist_hyp_2(a2['weather'], b2['weather'], separation_minima)
-         distance_affected_due_wind = calculate_dist_affected_due_wind(a2['wind'], b2['wind'], distance_affected_due_weather)
-         distance_affected_due_aircraft_weight_class = calculate_dist_affected_due_aircraft_weight_class\
-             (a2['aircraft_weight_class'], b2['aircraft_weight_class'], distance_affected_due_wind)
-         distance_affected_due_ground_traffic = calculate_dist_affected_due_ground_traffic\
-             (a2['ground_traffic'], b2['ground_traffic'], distance_affected_due_aircraft_weight_class)
-         distance_affected_due_air_traffic_congestion = calculate_dist_affected_due_air_traffic_congestion\
-             (a2['air_traffic_congestion'], b2['air_traffic_congestion'], distance_affected_due_ground_traffic)
-         temp_optimized_separation_minima = distance_affected_due_air_traffic_congestion
-
-         to_append = [a2['weather'], b2['weather'], a2['wind'], b2['wind'], a2['aircraft_weight_class'], b2['aircraft_weight_class'], \
-                      a2['ground_traffic'], b2['ground_traffic'], a2['air_traffic_congestion'], b2['air_traffic_congestion'], distance_affected_due_ground_traffic]
-         a_series = pd.Series(to_append, index=df1.columns)
-         df2 = df2.append(a_series, ignore_index=True)
-
-         distance_list_hyp2.append(temp_optimized_separation_minima)
-
-    # exporting to csv
-    df2.to_csv('hyp2_small.csv')
-    optimized_separation_minima_hyp2 = sum(distance_list_hyp2)/len(distance_list_hyp2)
-    output_hyp2 = round(optimized_separation_minima_hyp2, 3)
-    print("\nThe final calculated separation minima for hypothesis 2 is {}".format(output_hyp2))
\ No newline at end of file
+    sys.exit(main())
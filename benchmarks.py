@@ -0,0 +1,586 @@
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import platform
+import tempfile
+import importlib
+import statistics
+import tracemalloc
+import numpy as np
+
+# the simulation module; its name is not an identifier, so it cannot be imported with an import statement
+model = importlib.import_module('2022Spring_Finals')
+
+ENGINES = ('vectorized', 'pipeline', 'reference')
+HYPOTHESES = ('hyp_1', 'hyp_2')
+DEFAULT_SIZES = (10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7)
+QUICK_SIZES = (10 ** 3, 10 ** 4, 10 ** 5)
+
+# fields identifying a benchmark row when comparing against a baseline
+ROW_KEY = ('benchmark', 'engine', 'hypothesis', 'size', 'workers')
+
+# columns of the DataFrame the original loop recorded
+REFERENCE_COLUMNS = ['weather1', 'weather2', 'wind1', 'wind2', 'aircraft_weight_class1', 'aircraft_weight_class2',
+                     'ground_traffic1', 'ground_traffic2', 'air_traffic_congestion1', 'air_traffic_congestion2',
+                     'calculated_minima']
+
+
+# Frozen copy of the original model (the decider classes, the if-chains of the calculate_dist_* functions and the
+# main loop as first released), kept independent of separation_rules.json and of the engines so that it stays a
+# valid oracle and timing reference when the model changes. The deciders take a random.Random instead of the
+# random module to make runs reproducible.
+
+class reference_weather_decider:
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.temp_weather = rng.choice(['cat_1', 'cat_2', 'cat_3'])
+        self.weather_counter = 0
+
+    def get_weather(self):
+        if self.weather_counter % 100 == 0:
+            self.temp_weather = self.rng.choice(['cat_1', 'cat_2', 'cat_3'])
+        self.weather_counter += 1
+        return self.temp_weather
+
+
+class reference_wind_decider:
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.temp_wind = rng.choices(['headwind', 'tailwind', 'crosswind', 'wind_shear'], weights=(80, 10, 5, 5), k=1)
+        self.wind_counter = 0
+
+    def get_wind(self):
+        if self.wind_counter % 10 == 0:
+            self.temp_wind = self.rng.choices(['headwind', 'tailwind', 'crosswind', 'wind_shear'],
+                                              weights=(80, 10, 5, 5), k=1)
+        self.wind_counter += 1
+        return self.temp_wind[0]
+
+
+class reference_weight_decider:
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.temp_weight = []
+
+    def get_weight(self):
+        self.temp_weight = self.rng.choices(['light', 'medium', 'heavy', 'super'], weights=(5, 60, 30, 5), k=1)
+        return self.temp_weight[0]
+
+
+class reference_ground_traffic_decider:
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.temp_ground_traffic = rng.choice(['low', 'average', 'high'])
+        self.ground_traffic_counter = 0
+
+    def get_ground_traffic(self):
+        if self.ground_traffic_counter % 20 == 0:
+            self.temp_ground_traffic = self.rng.choice(['low', 'average', 'high'])
+        self.ground_traffic_counter += 1
+        return self.temp_ground_traffic
+
+
+class reference_airplane:
+
+    def __init__(self, weather_decider, wind_decider, weight_decider, ground_traffic_decider, hypotheis_type):
+        if hypotheis_type == "hyp_1":
+            self.weather = weather_decider.get_weather()
+        else:
+            self.weather = "cat_3"
+        self.wind = wind_decider.get_wind()
+        self.aircraft_weight_class = weight_decider.get_weight()
+        self.ground_traffic = ground_traffic_decider.get_ground_traffic()
+        if self.ground_traffic == 'high':
+            self.air_traffic_congestion = 'max'
+        if self.ground_traffic == 'average' or self.ground_traffic == 'low':
+            self.air_traffic_congestion = 'regular'
+
+
+def reference_weather(weather_1: str, weather_2: str, separation: float) -> float:
+    if weather_1 == weather_2:
+        return separation
+    elif weather_1 == 'cat_1':
+        if weather_2 == 'cat_2':
+            return separation + 0.5
+        else:
+            return separation + 1.5
+    elif weather_1 == 'cat_2':
+        if weather_2 == 'cat_1':
+            return separation - 0.5
+        else:
+            return separation + 1
+    else:
+        if weather_2 == 'cat_1':
+            return separation - 1.5
+        else:
+            return separation - 1
+
+
+def reference_hyp_2(weather_1: str, weather_2: str, separation: float) -> float:
+    if weather_1 == weather_2:
+        return separation + 1
+
+
+def reference_wind(wind_1: str, wind_2: str, separation: float) -> float:
+    if wind_1 == wind_2:
+        return separation
+    elif wind_1 == 'headwind':
+        if wind_2 == 'tailwind':
+            return separation - 0.2
+        elif wind_2 == 'crosswind':
+            return separation - 0.4
+        else:
+            return separation - 0.6
+    elif wind_1 == 'tailwind':
+        if wind_2 == 'headwind':
+            return separation + 0.2
+        elif wind_2 == 'crosswind':
+            return separation - 0.2
+        else:
+            return separation - 0.4
+    elif wind_1 == 'crosswind':
+        if wind_2 == 'headwind':
+            return separation + 0.4
+        elif wind_2 == 'tailwind':
+            return separation + 0.2
+        else:
+            return separation - 0.2
+    else:
+        if wind_2 == 'headwind':
+            return separation + 0.6
+        elif wind_2 == 'tailwind':
+            return separation + 0.4
+        else:
+            return separation + 0.2
+
+
+def reference_aircraft_weight_class(aircraft_weight_class_1: str, aircraft_weight_class_2: str,
+                                    separation: float) -> float:
+    if aircraft_weight_class_1 == aircraft_weight_class_2:
+        return separation
+    elif aircraft_weight_class_1 == 'light':
+        if aircraft_weight_class_2 == 'medium':
+            return separation - 1.8
+        elif aircraft_weight_class_2 == 'heavy':
+            return separation - 1.9
+        else:
+            return separation - 2
+    elif aircraft_weight_class_1 == 'medium':
+        if aircraft_weight_class_2 == 'light':
+            return separation + 0.4
+        elif aircraft_weight_class_2 == 'heavy':
+            return separation - 1.8
+        else:
+            return separation - 2
+    elif aircraft_weight_class_1 == 'heavy':
+        if aircraft_weight_class_2 == 'light':
+            return separation + 1.5
+        elif aircraft_weight_class_2 == 'medium':
+            return separation + 0.4
+        else:
+            return separation - 1.8
+    else:
+        if aircraft_weight_class_2 == 'light':
+            return separation + 3
+        elif aircraft_weight_class_2 == 'medium':
+            return separation + 2
+        else:
+            return separation + 1.5
+
+
+def reference_ground_traffic(ground_traffic_1: str, ground_traffic_2: str, separation: float) -> float:
+    if ground_traffic_1 == ground_traffic_2:
+        return separation
+    elif ground_traffic_1 == 'low':
+        if ground_traffic_2 == 'average':
+            return separation + 0.2
+        else:
+            return separation + 0.4
+    elif ground_traffic_1 == 'average':
+        if ground_traffic_2 == 'low':
+            return separation - 0.2
+        else:
+            return separation + 0.2
+    else:
+        if ground_traffic_2 == 'low':
+            return separation - 0.4
+        else:
+            return separation - 0.2
+
+
+def reference_air_traffic_congestion(air_traffic_congestion_1: str, air_traffic_congestion_2: str,
+                                     separation: float) -> float:
+    if air_traffic_congestion_1 == air_traffic_congestion_2:
+        return separation
+    elif air_traffic_congestion_1 == 'regular':
+        return separation + 0.3
+    else:
+        return separation - 0.3
+
+
+def reference_separation(weather_rule, aircraft_1: dict, aircraft_2: dict, separation_minima: float = 5) -> float:
+    """
+        The five chained rules of the original loop for one pair, given the attribute dicts of both aircraft.
+    """
+    distance = weather_rule(aircraft_1['weather'], aircraft_2['weather'], separation_minima)
+    distance = reference_wind(aircraft_1['wind'], aircraft_2['wind'], distance)
+    distance = reference_aircraft_weight_class(aircraft_1['aircraft_weight_class'],
+                                               aircraft_2['aircraft_weight_class'], distance)
+    distance = reference_ground_traffic(aircraft_1['ground_traffic'], aircraft_2['ground_traffic'], distance)
+    return reference_air_traffic_congestion(aircraft_1['air_traffic_congestion'],
+                                            aircraft_2['air_traffic_congestion'], distance)
+
+
+def reference_loop(n_aircraft: int, hypothesis_type: str = "hyp_1", rng: random.Random = None,
+                   record: bool = True) -> list:
+    """
+        The landing sequence loop of the original main block: airplane objects kept in a dict under string keys,
+        their __dict__ read for every pair, the five chained rules and, when record is set, one DataFrame row
+        appended per pair (DataFrame.append no longer exists, pd.concat is its documented replacement). It is the
+        oracle the engines are checked against and the reference they are timed against; recording grows
+        quadratically, as it did in the original.
+        :param n_aircraft: number of aircraft in the sequence
+        :param hypothesis_type: "hyp_1" or "hyp_2"
+        :param rng: random.Random drawing the conditions
+        :param record: append every pair to a DataFrame as the original did
+        :return: list of the separation minima of all consecutive pairs
+        >>> len(reference_loop(10, "hyp_2", random.Random(1)))
+        9
+    """
+    rng = rng or random.Random()
+    weather_decider = reference_weather_decider(rng)
+    wind_decider = reference_wind_decider(rng)
+    weight_decider = reference_weight_decider(rng)
+    ground_traffic_decider = reference_ground_traffic_decider(rng)
+    weather_rule = reference_weather if hypothesis_type == "hyp_1" else reference_hyp_2
+    airplane_objects_dict = {}
+    distance_list = []
+    if record:
+        import pandas as pd
+        df = pd.DataFrame(columns=REFERENCE_COLUMNS)
+    for i in range(1, n_aircraft + 1):
+        name = 'airplane_{}'.format(i)
+        airplane_objects_dict[name] = reference_airplane(weather_decider, wind_decider, weight_decider,
+                                                         ground_traffic_decider, hypothesis_type)
+        if i > 1:
+            a1 = airplane_objects_dict['airplane_{}'.format(i - 1)].__dict__
+            b1 = airplane_objects_dict['airplane_{}'.format(i)].__dict__
+            distance = reference_separation(weather_rule, a1, b1)
+            if record:
+                to_append = [a1['weather'], b1['weather'], a1['wind'], b1['wind'], a1['aircraft_weight_class'],
+                             b1['aircraft_weight_class'], a1['ground_traffic'], b1['ground_traffic'],
+                             a1['air_traffic_congestion'], b1['air_traffic_congestion'], distance]
+                a_series = pd.Series(to_append, index=df.columns)
+                df = pd.concat([df, a_series.to_frame().T], ignore_index=True)
+            distance_list.append(distance)
+    return distance_list
+
+
+def run_engine(engine: str, n_aircraft: int, hypothesis_type: str, seed: int, record: bool = True) -> float:
+    """
+        Simulates one landing sequence with an engine and returns its average separation minima.
+        :param engine: 'vectorized', 'pipeline' (generator pipeline of the decider classes) or 'reference' (the
+                       frozen original loop)
+        :param n_aircraft: number of aircraft in the sequence
+        :param hypothesis_type: "hyp_1" or "hyp_2"
+        :param seed: seed of the random stream
+        :param record: whether the reference loop records its DataFrame
+        :return: average separation minima in NM
+        >>> round(run_engine('vectorized', 10_000, "hyp_2", 1), 1), round(run_engine('reference', 10_000, "hyp_2", 1, False), 1)
+        (5.7, 5.7)
+    """
+    if engine == 'vectorized':
+        return model.run_vectorized_hypothesis(n_aircraft, hypothesis_type, np.random.default_rng(seed))
+    if engine == 'pipeline':
+        rng = random.Random(seed)
+        stats = model.separation_statistics()
+        aircraft = model.generate_aircraft(n_aircraft, hypothesis_type, model.weather_decider(rng),
+                                           model.wind_decider(rng), model.weight_decider(rng),
+                                           model.ground_traffic_decider(rng))
+        model.run_pair_pipeline(model.score_pairs(model.pair_stream(aircraft), hypothesis_type),
+                                model.statistics_stage(stats))
+        return stats.mean
+    if engine == 'reference':
+        return statistics.fmean(reference_loop(n_aircraft, hypothesis_type, random.Random(seed), record))
+    raise ValueError("engine must be one of {}".format(', '.join(ENGINES)))
+
+
+def _timed(function, *args, repeats: int = 1) -> float:
+    """
+        Best wall clock time of repeats calls.
+    """
+    best = math.inf
+    for i in range(repeats):
+        started = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _peak_memory(function, *args) -> int:
+    """
+        Peak memory (bytes) traced by tracemalloc during one call; numpy reports its array buffers to tracemalloc.
+    """
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_throughput(sizes: tuple = DEFAULT_SIZES, engines: tuple = ENGINES, pipeline_max: int = 10 ** 5,
+                         reference_max: int = 10 ** 4, seed: int = 0) -> list:
+    """
+        Aircraft pairs per second and peak memory of every engine and hypothesis at every size. The per-aircraft
+        pipeline only runs up to pipeline_max aircraft, and the original loop, whose DataFrame recording is
+        quadratic, up to reference_max.
+        :return: benchmark rows
+    """
+    largest = {'vectorized': math.inf, 'pipeline': pipeline_max, 'reference': reference_max}
+    rows = []
+    for engine in engines:
+        for hypothesis_type in HYPOTHESES:
+            for size in sizes:
+                if size > largest[engine]:
+                    continue
+                # small runs are repeated, their timings are noisy
+                seconds = _timed(run_engine, engine, size, hypothesis_type, seed, repeats=3 if size <= 10 ** 4 else 1)
+                rows.append({'benchmark': 'throughput', 'engine': engine, 'hypothesis': hypothesis_type, 'size': size,
+                             'workers': 1, 'seconds': seconds, 'rate': (size - 1) / seconds, 'unit': 'pairs/s',
+                             'peak_bytes': _peak_memory(run_engine, engine, size, hypothesis_type, seed)})
+    return rows
+
+
+def benchmark_export(n_aircraft: int = 10 ** 6, seed: int = 0) -> list:
+    """
+        Recording and export throughput: pairs recorded into a pair_record_buffer, then written as CSV, as a
+        binary trace and as pair state counts.
+        :return: benchmark rows, the rate in rows per second and the bytes of every file written
+    """
+    rows = []
+    sequences = list(model.iterate_landing_sequence(n_aircraft, "hyp_1", np.random.default_rng(seed)))
+    n_pairs = sum(len(separations) for sequence, separations in sequences)
+
+    def record():
+        buffer = model.pair_record_buffer()
+        for sequence, separations in sequences:
+            buffer.extend(sequence, separations)
+        return buffer
+
+    buffer = record()
+    temporary = tempfile.TemporaryDirectory()
+    directory = temporary.name
+
+    def export_csv():
+        with model.chunked_csv_exporter(os.path.join(directory, 'pairs.csv')) as exporter:
+            exporter.write(buffer.columns())
+
+    def export_binary():
+        with model.binary_trace_writer(os.path.join(directory, 'pairs.septrace')) as writer:
+            writer.write(buffer.columns())
+
+    def export_counts():
+        counts = model.pair_state_counts("hyp_1")
+        for sequence, separations in sequences:
+            counts.add_states(model.encode_states(sequence))
+        counts.save(os.path.join(directory, 'pairs.npz'))
+
+    for name, function, path in (('record', record, None), ('csv', export_csv, 'pairs.csv'),
+                                 ('binary', export_binary, 'pairs.septrace'), ('counts', export_counts, 'pairs.npz')):
+        seconds = _timed(function)
+        row = {'benchmark': 'export', 'engine': name, 'hypothesis': "hyp_1", 'size': n_aircraft, 'workers': 1,
+               'seconds': seconds, 'rate': n_pairs / seconds, 'unit': 'rows/s'}
+        if path is not None:
+            row['bytes'] = os.path.getsize(os.path.join(directory, path))
+        rows.append(row)
+    temporary.cleanup()
+    return rows
+
+
+def benchmark_workers(workers: tuple, n_aircraft: int = 2 * 10 ** 6, n_replications: int = None,
+                      seed: int = 0) -> list:
+    """
+        Scaling of run_replications with the number of worker processes, on a fixed total amount of work.
+        :return: benchmark rows, with the speedup over the first worker count
+    """
+    n_replications = n_replications or 2 * max(workers)
+    rows = []
+    for count in workers:
+        seconds = _timed(model.run_replications, "hyp_1", n_replications, n_aircraft, seed, count)
+        rows.append({'benchmark': 'workers', 'engine': 'vectorized', 'hypothesis': "hyp_1", 'size': n_aircraft,
+                     'workers': count, 'seconds': seconds,
+                     'rate': n_replications * (n_aircraft - 1) / seconds, 'unit': 'pairs/s'})
+    for row in rows:
+        row['speedup'] = rows[0]['seconds'] / row['seconds']
+    return rows
+
+
+def check_agreement(engines: tuple = ENGINES, n_sequences: int = 20, n_aircraft: int = 5000, seed: int = 0,
+                    threshold: float = 4.0) -> list:
+    """
+        Checks that every engine agrees statistically with the frozen original loop and with the exact solver. Each
+        engine simulates n_sequences independent landing sequences; pairs within a sequence are correlated by the
+        block redraws, so the sequence averages are compared: by a Welch t statistic against the sequence averages
+        of the original loop, and by a t statistic against the exact long-run mean (corrected for the pairs of a
+        finite sequence). The exact solver reads the same rule file as the engines, only the original loop is
+        independent of it; check_rule_tables compares the rules themselves.
+        :param threshold: largest |t| accepted
+        :return: benchmark rows with the t statistics and whether the engine agrees
+        >>> all(row['agrees'] for row in check_agreement(('vectorized', 'pipeline'), 10, 2000))
+        True
+    """
+    rows = []
+    for hypothesis_type in HYPOTHESES:
+        exact_mean = model.solve_exact_separation(hypothesis_type, n_aircraft=n_aircraft).mean
+        seeds = np.random.SeedSequence(seed).generate_state(n_sequences)
+        means = {engine: [run_engine(engine, n_aircraft, hypothesis_type, int(s), record=False) for s in seeds]
+                 for engine in set(engines) | {'reference'}}
+        reference = means['reference']
+        for engine in engines:
+            mean = statistics.fmean(means[engine])
+            std_error = statistics.stdev(means[engine]) / math.sqrt(n_sequences)
+            t_exact = (mean - exact_mean) / std_error
+            if engine == 'reference':
+                t_reference = 0.0
+            else:
+                t_reference = (mean - statistics.fmean(reference)) / math.sqrt(
+                    std_error ** 2 + statistics.variance(reference) / n_sequences)
+            rows.append({'benchmark': 'agreement', 'engine': engine, 'hypothesis': hypothesis_type,
+                         'size': n_aircraft, 'workers': 1, 'mean': mean, 'exact_mean': exact_mean,
+                         't_reference': t_reference, 't_exact': t_exact,
+                         'agrees': abs(t_reference) < threshold and abs(t_exact) < threshold})
+    return rows
+
+
+def check_rule_tables() -> list:
+    """
+        Compares the compiled pairwise tables of the shipped rule file, for every pair of aircraft states, with the
+        five chained if-chains of the original model.
+        :return: benchmark rows, one per hypothesis, with the number of state pairs that differ
+        >>> [row['mismatches'] for row in check_rule_tables()]
+        [0, 0]
+    """
+    states = list(zip(*np.unravel_index(np.arange(model.N_STATES), model.STATE_SHAPE)))
+    attributes = []
+    for weather, wind, weight, ground in states:
+        ground_traffic = model.GROUND_TRAFFIC_TYPES[ground]
+        attributes.append({'weather': model.WEATHER_TYPES[weather], 'wind': model.WIND_TYPES[wind],
+                           'aircraft_weight_class': model.AIRCRAFT_WEIGHT_CLASSES[weight],
+                           'ground_traffic': ground_traffic,
+                           'air_traffic_congestion': 'max' if ground_traffic == 'high' else 'regular'})
+    rows = []
+    for hypothesis_type, weather_rule in (("hyp_1", reference_weather), ("hyp_2", reference_hyp_2)):
+        table = model.SEPARATION_RULES.pair_table(hypothesis_type)
+        mismatches = 0
+        for i, aircraft_1 in enumerate(attributes):
+            for j, aircraft_2 in enumerate(attributes):
+                # the hypothesis 2 rule is only defined for unchanged weather
+                if hypothesis_type == "hyp_2" and aircraft_1['weather'] != aircraft_2['weather']:
+                    continue
+                expected = reference_separation(weather_rule, aircraft_1, aircraft_2)
+                mismatches += bool(abs(table[i, j] - expected) > 1e-9)
+        rows.append({'benchmark': 'agreement', 'engine': 'rule_tables', 'hypothesis': hypothesis_type,
+                     'size': model.N_STATES ** 2, 'workers': 1, 'mismatches': mismatches,
+                     'agrees': mismatches == 0})
+    return rows
+
+
+def compare_to_baseline(rows: list, baseline: list, tolerance: float = 0.2) -> list:
+    """
+        Regressions of a benchmark run against a baseline: rows whose rate dropped by more than tolerance (as a
+        fraction of the baseline rate), and engines that no longer agree with the reference.
+        :param rows: benchmark rows of the current run
+        :param baseline: benchmark rows of the baseline run
+        :param tolerance: accepted relative slowdown
+        :return: list of messages, empty if there is no regression
+        >>> baseline = [{'benchmark': 'throughput', 'engine': 'vectorized', 'hypothesis': 'hyp_1', 'size': 1000,
+        ...              'workers': 1, 'rate': 1e6, 'unit': 'pairs/s'}]
+        >>> compare_to_baseline([dict(baseline[0], rate=9e5)], baseline), len(compare_to_baseline([dict(baseline[0], rate=5e5)], baseline))
+        ([], 1)
+    """
+    baseline_rates = {tuple(row[key] for key in ROW_KEY): row['rate'] for row in baseline if 'rate' in row}
+    regressions = []
+    for row in rows:
+        key = tuple(row[field] for field in ROW_KEY)
+        if row['benchmark'] == 'agreement':
+            if not row['agrees'] and 'mismatches' in row:
+                regressions.append("{} state pairs of the {} rule tables differ from the original rules".format(
+                    row['mismatches'], row['hypothesis']))
+            elif not row['agrees']:
+                regressions.append("{} engine disagrees with the reference on {} (t {:.2f}, {:.2f} vs exact)".format(
+                    row['engine'], row['hypothesis'], row['t_reference'], row['t_exact']))
+        elif key in baseline_rates and row['rate'] < (1 - tolerance) * baseline_rates[key]:
+            regressions.append("{} {} {} size {} workers {}: {:.4g} {} against {:.4g} in the baseline".format(
+                *key, row['rate'], row['unit'], baseline_rates[key]))
+    return regressions
+
+
+def environment() -> dict:
+    """
+        Description of the machine and versions a benchmark ran on, stored with the baselines.
+    """
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+            'processor': platform.processor(), 'cpu_count': os.cpu_count(), 'engine_version': model.ENGINE_VERSION}
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks simulation throughput, memory, export cost and worker "
+                                                 "scaling of 2022Spring_Finals.py.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=None, help="aircraft per run (default 10^3 to 10^7)")
+    parser.add_argument('--quick', action='store_true', help="sizes up to 10^5 and a smaller export run")
+    parser.add_argument('--pipeline-max', type=int, default=10 ** 5,
+                        help="largest size run by the per-aircraft pipeline (default: %(default)s)")
+    parser.add_argument('--reference-max', type=int, default=None,
+                        help="largest size run by the original loop (default 10^4, 10^3 with --quick)")
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+                        help="worker counts of the scaling benchmark (default powers of two up to the core count)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', metavar='PATH', help="write the results as a JSON baseline")
+    parser.add_argument('--compare', metavar='PATH', help="compare the results against a JSON baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="accepted relative slowdown against the baseline (default: %(default)s)")
+    args = parser.parse_args(argv)
+    sizes = args.sizes or (QUICK_SIZES if args.quick else DEFAULT_SIZES)
+    workers = args.workers or [2 ** i for i in range(int(math.log2(os.cpu_count() or 1)) + 1)]
+
+    reference_max = args.reference_max or (10 ** 3 if args.quick else 10 ** 4)
+    rows = benchmark_throughput(sizes, pipeline_max=args.pipeline_max, reference_max=reference_max, seed=args.seed)
+    rows += benchmark_export(10 ** 5 if args.quick else 10 ** 6, args.seed)
+    rows += benchmark_workers(workers, 2 * 10 ** 5 if args.quick else 2 * 10 ** 6, seed=args.seed)
+    rows += check_rule_tables()
+    rows += check_agreement(seed=args.seed)
+    for row in rows:
+        if 'mismatches' in row:
+            print("{benchmark:<11}{engine:<12}{hypothesis:<7}{mismatches} of {size} state pairs differ {}".format(
+                'ok' if row['agrees'] else 'DISAGREES', **row))
+        elif row['benchmark'] == 'agreement':
+            print("{benchmark:<11}{engine:<12}{hypothesis:<7}mean {mean:.4f} exact {exact_mean:.4f} "
+                  "t {t_reference:+.2f} / {t_exact:+.2f} {}".format('ok' if row['agrees'] else 'DISAGREES', **row))
+        else:
+            print("{benchmark:<11}{engine:<12}{hypothesis:<7}{size:>10} x{workers:<3}{seconds:9.4f} s {rate:14,.0f} "
+                  "{unit}{}".format(' peak {:.1f} MB'.format(row['peak_bytes'] / 2 ** 20) if 'peak_bytes' in row
+                                    else '', **row))
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump({'environment': environment(), 'results': rows}, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare_to_baseline(rows, json.load(file)['results'], args.tolerance)
+        for regression in regressions:
+            print("REGRESSION " + regression, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0 if all(row['agrees'] for row in rows if row['benchmark'] == 'agreement') else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())